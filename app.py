@@ -6,19 +6,65 @@ Created by Jonathan Paul & Antigravity
 
 import os
 import re
+import io
+import csv
+import copy
 import json
 import sys
 import threading
+import atexit
 import uuid
 import shutil
+import sqlite3
 import subprocess
-import requests
+import time
+import bisect
+import itertools
+import hashlib
+import importlib.util
+import pstats
+import cProfile
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, Future
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, send_file
 
-import yt_dlp
+
+# ============== LAZY IMPORTS ==============
+# yt-dlp (over a thousand extractors), requests, mutagen and win10toast are
+# imported on first use so the server is up before they are loaded
+
+class LazyProxy:
+    """Stand-in that imports or builds the real object on first attribute access"""
+
+    def __init__(self, load):
+        self._load = load
+        self._target = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._load()
+        return getattr(self._target, name)
+
+
+def _import_yt_dlp():
+    import yt_dlp
+    return yt_dlp
+
+
+def _import_requests():
+    import requests
+    return requests
+
+
+yt_dlp = LazyProxy(_import_yt_dlp)
+requests = LazyProxy(_import_requests)
 
 # ============== SETUP FFMPEG PATH ==============
 # This must be done before anything else tries to use ffmpeg
@@ -35,37 +81,984 @@ APP_VERSION = "1.0.6"
 GITHUB_REPO = "jonathans25plus-gif/-youtube-extractor"
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
 
-# Try to import optional dependencies
-try:
-    from mutagen.mp3 import MP3
-    from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, ID3NoHeaderError
-    MUTAGEN_AVAILABLE = True
-except ImportError:
-    MUTAGEN_AVAILABLE = False
-
-try:
-    from win10toast import ToastNotifier
-    TOAST_AVAILABLE = True
-    toaster = ToastNotifier()
-except ImportError:
-    TOAST_AVAILABLE = False
+# Optional dependencies (imported where they are used)
+MUTAGEN_AVAILABLE = importlib.util.find_spec('mutagen') is not None
+TOAST_AVAILABLE = importlib.util.find_spec('win10toast') is not None
 
 app = Flask(__name__)
 
+
+def get_data_dir():
+    """Get the directory holding the persistent stores (jobs, history, caches)"""
+    if getattr(sys, 'frozen', False):
+        # The onefile exe runs from a temp dir deleted on exit and is installed
+        # under Program Files, which isn't writable: use the user's app data
+        root = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or str(Path.home())
+        data_dir = Path(root) / "YouTube Extractor"
+        data_dir.mkdir(parents=True, exist_ok=True)
+        return data_dir
+    return Path(__file__).parent
+
+
 # Configuration
+DATA_DIR = get_data_dir()
 DEFAULT_DOWNLOAD_FOLDER = str(Path.home() / "Downloads" / "YouTube Media")
-HISTORY_FILE = Path(__file__).parent / "history.json"
+HISTORY_FILE = DATA_DIR / "history.json"  # Legacy format, migrated on load
+HISTORY_LOG_FILE = DATA_DIR / "history.jsonl"
+HISTORY_LIMIT = 100  # Entries kept in memory and shown in the UI
+HISTORY_FAILED_LIMIT = 20  # Failed/cancelled task summaries kept on top of HISTORY_LIMIT downloads
+HISTORY_FLUSH_INTERVAL = 0.5  # seconds appends are batched before one write
+HISTORY_COMPACT_THRESHOLD = 500  # Log lines before it is compacted
+JOBS_DB_FILE = DATA_DIR / "jobs.db"
+JOB_RETENTION = 7 * 24 * 3600  # seconds finished tasks are kept in the job store
+TASK_RETENTION = 600  # seconds a finished task's progress stays in memory
+TASK_MAX_FINISHED = 2000  # finished task records (playlist entries included) kept in memory
+TASK_MIN_RETENTION = 30  # seconds a finished task is kept even over the limit, so clients see its final state
 MAX_PARALLEL_DOWNLOADS = 3
+MIN_PRIORITY = -100  # Task priorities are clamped to [MIN_PRIORITY, MAX_PRIORITY], higher starts first
+MAX_PRIORITY = 100
+PLATFORM_CONCURRENCY_LIMITS = {'instagram': 2}  # Max simultaneous jobs per platform
+CONNECTION_MODES = ('native', 'fragments', 'external')
+MAX_CONNECTIONS_PER_TASK = 16
+MAX_TOTAL_CONNECTIONS = 16  # Connections shared by all running downloads
+EXTERNAL_DOWNLOADER = 'aria2c'
+BANDWIDTH_LIMIT = 0  # bytes/s shared by all downloads, 0 = unlimited
+BANDWIDTH_SCHEDULE = []  # [{'start': '08:00', 'end': '18:00', 'rate': bytes/s}] overriding the limit
+BANDWIDTH_BURST = 1.0  # seconds of a task's share it may download in one burst
+SEARCH_CACHE_TTL = 600  # seconds a search result stays valid
+SEARCH_CACHE_MAX_ENTRIES = 64
+SEARCH_MODE = 'incremental'  # 'incremental' (fetch per page) or 'full' (resolve all results up front)
+SEARCH_PER_PAGE = 10
+SEARCH_LOOKAHEAD = 10  # Extra entries fetched past the requested page
+FLAT_SEARCH_PLATFORMS = {'youtube'}  # Platforms whose flat search entries carry title/duration
+METADATA_CACHE_TTL = 1800  # seconds an extracted info dict is reused
+METADATA_CACHE_MAX_ENTRIES = 32  # full info dicts are large (formats, subtitles...)
+METADATA_EXPIRY_MARGIN = 300  # drop cached info this long before its signed URLs expire
+COOKIE_BROWSER = 'chrome'
+COOKIE_JAR_TTL = 1800  # reload browser cookies at least this often
+COOKIE_JAR_MIN_RELOAD = 60  # ignore cookie database changes more frequent than this
+COOKIE_JAR_RETRY = 300  # seconds before retrying after a failed load
+PLAYLIST_FANOUT = True  # Download playlist entries as separate tasks across the worker pool
+TRANSCODE_WORKERS = os.cpu_count() or 2  # Concurrent ffmpeg processes
+TAG_WORKERS = 2
+STAGE_BACKLOG = 2  # Jobs a stage may hold per worker before upstream blocks
+EVENTS_RATE = 4  # Default flushes per second for each /api/events client
+EVENTS_MAX_RATE = 20
+EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+EVENT_EXCLUDED_FIELDS = ('files', 'errors', 'children')  # Sent as counts; fetch /api/progress for the lists
+CLASSIFY_MAX_URLS = 10000  # URLs accepted by one /api/classify request
+IMPORT_MAX_ITEMS = 20000  # Queue items one /api/queue/import request may add
+CHANGELOG_TOMBSTONES = 1000  # Removed ids remembered for ?since= queries before a full resync is needed
+HTTP_POOL_SIZE = 8  # Keep-alive connections per host for auxiliary fetches
+HTTP_TIMEOUT = 10
+THUMBNAIL_CACHE_DIR = DATA_DIR / "thumbnails"
+THUMBNAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+THUMBNAIL_PREFETCH_WORKERS = 2
+PREVIEW_CACHE_DIR = DATA_DIR / "previews"
+PREVIEW_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PREVIEW_CACHE_SECONDS = 30  # Start of each previewed track kept on disk (the UI plays 30s)
+PREVIEW_PREFIX_MAX_BYTES = 4 * 1024 * 1024  # Cap on the cached start of one track
+PREVIEW_STREAM_TTL = 1800  # seconds a resolved stream URL is reused (less if it expires sooner)
+PREVIEW_MAX_STREAMS = 256
+PREVIEW_CHUNK_SIZE = 64 * 1024
+PREVIEW_PREFETCH_COUNT = 5  # Top results of each search page whose preview stream is resolved ahead of a click
+PREVIEW_PREFETCH_WORKERS = 2
+PROFILE_DIR = DATA_DIR / "profiles"
+PROFILE_KEEP = 20  # Newest task profiles kept on disk
+PROFILE_TOP = 30  # Functions / allocation sites listed in a profile summary
+METRICS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)  # seconds
 
 # Global state
 download_queue = []  # List of pending downloads
-active_downloads = {}  # task_id -> download info
 download_history = []  # Completed downloads
 cancel_flags = {}  # task_id -> bool (if True, cancel requested)
-executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS)
 
 # Lock for thread-safe operations
 queue_lock = threading.Lock()
+task_lock = threading.Lock()  # Guards playlist parent/child roll-ups
+
+FINISHED_STATUSES = ('completed', 'error', 'cancelled')
+
+
+# ============== CACHES ==============
+
+class TTLCache:
+    """Thread-safe LRU cache where every entry expires after a TTL"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """Drop every entry (or only those whose key matches predicate)"""
+        with self._lock:
+            if predicate is None:
+                removed = len(self._data)
+                self._data.clear()
+                return removed
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+search_cache = TTLCache(SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL)
+
+# Raw (unprocessed) info dicts shared by /api/info, preview and downloads,
+# keyed by (extractor, video id); URLs are aliased to their canonical key
+metadata_cache = TTLCache(METADATA_CACHE_MAX_ENTRIES, METADATA_CACHE_TTL)
+metadata_url_aliases = TTLCache(METADATA_CACHE_MAX_ENTRIES * 8, METADATA_CACHE_TTL)
+_extractor_classes = None
+
+# Browser cookies, loaded once and shared by every download
+cookie_jar_state = {
+    'jar': None,
+    'loaded_at': 0,  # time.monotonic() of the last load attempt
+    'db_mtime': None,
+    'error': None,
+}
+cookie_jar_lock = threading.Lock()
+
+# Background fill-in of fields missing from flat search entries
+search_enrich_executor = ThreadPoolExecutor(max_workers=2)
+search_enrich_pending = set()  # (platform, id) currently being resolved
+search_enrich_lock = threading.Lock()
+
+
+def normalize_search_query(query):
+    """Normalize a search query so equivalent queries share a cache entry"""
+    return ' '.join((query or '').lower().split())
+
+
+# ============== METRICS ==============
+
+METRIC_HELP = {
+    'ytextractor_stage_seconds': ('histogram', 'Time spent in each download stage, by platform'),
+    'ytextractor_retries_total': ('counter', 'Extraction and download retries'),
+    'ytextractor_tasks_total': ('counter', 'Download tasks finished, by final status'),
+    'ytextractor_stage_errors_total': ('counter', 'Pipeline jobs that failed, by stage'),
+    'ytextractor_cache_hits_total': ('counter', 'Cache hits'),
+    'ytextractor_cache_misses_total': ('counter', 'Cache misses'),
+    'ytextractor_queue_depth': ('gauge', 'Jobs waiting, by queue'),
+    'ytextractor_active_workers': ('gauge', 'Jobs being worked on, by stage'),
+    'ytextractor_connections_in_use': ('gauge', 'Download connections granted by the budget'),
+    'ytextractor_event_subscribers': ('gauge', 'Connected /api/events clients'),
+    'ytextractor_tasks_in_memory': ('gauge', 'Task records held in memory, finished ones included'),
+    'ytextractor_tasks_evicted_total': ('counter', 'Finished tasks evicted from memory'),
+}
+
+
+class Metrics:
+    """Counters and latency histograms exposed by /api/metrics
+    
+    Recording is a dict lookup and a couple of additions under one lock;
+    nothing is formatted until the endpoint is scraped.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of a with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self, samples=()):
+        """Prometheus text format of the recorded metrics plus extra (name, labels, value) samples"""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, list(counts)) for key, counts in self._histograms.items()]
+        
+        families = {}
+        for (name, labels), value in counters:
+            families.setdefault(name, []).append((name, labels, value))
+        for name, labels, value in samples:
+            families.setdefault(name, []).append((name, tuple(sorted(labels.items())), value))
+        for (name, labels), counts in histograms:
+            family = families.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                family.append((f'{name}_bucket', labels + (('le', str(bound)),), cumulative))
+            family.append((f'{name}_sum', labels, counts[-1]))
+            family.append((f'{name}_count', labels, cumulative))
+        
+        lines = []
+        for name in sorted(families):
+            kind, help_text = METRIC_HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in families[name]:
+                if labels:
+                    label_text = ','.join(f'{k}="{format_label_value(v)}"' for k, v in labels)
+                    sample = f'{sample}{{{label_text}}}'
+                lines.append(f'{sample} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_label_value(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics(METRICS_BUCKETS)
+
+
+# ============== EVENTS ==============
+
+class EventSubscriber:
+    """Pending deltas for one /api/events client, coalesced per (kind, key)"""
+
+    def __init__(self):
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+
+    def push(self, key, delta):
+        with self._cond:
+            if key in self._pending:
+                self._pending[key].update(delta)
+            else:
+                self._pending[key] = dict(delta)
+            self._cond.notify()
+
+    def drain(self, timeout):
+        """Wait up to timeout for updates and take everything pending"""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            items, self._pending = self._pending, OrderedDict()
+        return items
+
+
+class EventBroker:
+    """Publishes state changes to Server-Sent Events clients as deltas
+    
+    publish() compares the new fields of (kind, key) with what was last
+    published and forwards only the changed ones; each subscriber merges
+    updates to the same key until its next flush. broadcast() forwards
+    one-off events (history entries) whole and remembers nothing about them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}  # (kind, key) -> last published fields
+        self._subscribers = set()
+
+    def publish(self, kind, key, fields):
+        with self._lock:
+            last = self._last.setdefault((kind, key), {})
+            delta = {k: v for k, v in fields.items() if k not in last or last[k] != v}
+            if not delta:
+                return
+            last.update(delta)
+            for subscriber in self._subscribers:
+                subscriber.push((kind, key), delta)
+
+    def broadcast(self, kind, key, fields):
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.push((kind, key), fields)
+
+    def forget(self, kind, key):
+        with self._lock:
+            self._last.pop((kind, key), None)
+
+    def subscribe(self):
+        subscriber = EventSubscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class ChangeLog:
+    """Version numbers for a keyed collection, so clients can fetch only what changed
+    
+    Keys are kept in the order they last changed, so since() only walks the
+    changes newer than the client's version. Versions start at the process
+    start time in milliseconds: a version from before a restart, or older
+    than the oldest remembered removal, asks for a full resync instead.
+    """
+
+    def __init__(self, tombstone_limit=CHANGELOG_TOMBSTONES):
+        self._lock = threading.Lock()
+        self._changed = OrderedDict()  # key -> version, oldest change first
+        self._removed = OrderedDict()
+        self._tombstone_limit = tombstone_limit
+        self.version = self._floor = int(time.time() * 1000)
+
+    def touch(self, key):
+        with self._lock:
+            self.version += 1
+            self._removed.pop(key, None)
+            self._changed[key] = self.version
+            self._changed.move_to_end(key)
+            return self.version
+
+    def remove(self, key):
+        with self._lock:
+            self.version += 1
+            self._changed.pop(key, None)
+            self._removed[key] = self.version
+            self._removed.move_to_end(key)
+            while len(self._removed) > self._tombstone_limit:
+                _, dropped = self._removed.popitem(last=False)
+                self._floor = dropped
+            return self.version
+
+    def since(self, version):
+        """Return (current version, changed keys, removed keys), or None if a full resync is needed"""
+        with self._lock:
+            if version < self._floor or version > self.version:
+                return None
+            changed = list(itertools.takewhile(
+                lambda key: self._changed[key] > version, reversed(self._changed)))
+            removed = list(itertools.takewhile(
+                lambda key: self._removed[key] > version, reversed(self._removed)))
+            changed.reverse()
+            removed.reverse()
+            return self.version, changed, removed
+
+
+event_broker = EventBroker()
+queue_changes = ChangeLog()
+task_changes = ChangeLog()
+queue_order_version = queue_changes.version  # last reorder of download_queue
+history_event_seq = itertools.count()
+parent_publish_times = {}  # parent task_id -> time.monotonic() of last aggregate publish
+
+
+# ============== TASK REGISTRY ==============
+
+class TaskState:
+    """Progress and results of one download task
+    
+    A slotted record read and written like a dict (state['percent'] = 50);
+    fields that were never set take no space. Unknown fields raise KeyError.
+    """
+
+    __slots__ = (
+        'status', 'percent', 'speed', 'eta', 'downloaded', 'total', 'completed', 'current_title',
+        'format_type', 'platform', 'url', 'parent', 'children', 'files', 'errors', 'error', 'skipped',
+        'connection_mode', 'connections', 'bandwidth_limit', 'bandwidth_headroom', 'pipeline_pending',
+        'finished_at',
+    )
+    _fields = frozenset(__slots__)
+
+    def __init__(self, fields=None):
+        if fields:
+            self.update(fields)
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(f"Unknown task field: {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._fields and hasattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def __repr__(self):
+        return f'TaskState({dict(self.items())!r})'
+
+
+class TaskRegistry:
+    """Download task states by id, bounded in memory
+    
+    Finished tasks stay readable for `ttl` seconds. Past that, or once more
+    than `max_finished` finished records are held (and the task is at least
+    TASK_MIN_RETENTION seconds old), the oldest are evicted together with
+    their playlist entries, cancel flags and event state. Failed and cancelled
+    tasks leave a summary in the history, dated when they finished and capped
+    apart from downloads (HISTORY_FAILED_LIMIT); completed ones already have
+    their files there. A playlist is never evicted while one of its entries runs.
+    """
+
+    def __init__(self, ttl, max_finished):
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._tasks = {}  # task_id -> TaskState
+        self._finished = OrderedDict()  # top-level task_id -> (time.monotonic(), records), oldest first
+        self._finished_records = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __getitem__(self, task_id):
+        return self._tasks[task_id]
+
+    def __setitem__(self, task_id, state):
+        self._tasks[task_id] = state if isinstance(state, TaskState) else TaskState(state)
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def __iter__(self):
+        return iter(list(self._tasks))
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def get(self, task_id, default=None):
+        return self._tasks.get(task_id, default)
+
+    def setdefault(self, task_id, state):
+        task = self._tasks.get(task_id)
+        if task is None:
+            task = self._tasks[task_id] = TaskState(state)
+        return task
+
+    def finished(self, task_id):
+        """Start the retention clock of a finished top-level task, then evict expired tasks"""
+        state = self._tasks.get(task_id)
+        if state is None:
+            return
+        state['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        if state.get('parent'):
+            return  # Playlist entries go with their playlist task
+        with self._lock:
+            if task_id not in self._finished:
+                records = 1 + len(state.get('children', ()))
+                self._finished[task_id] = (time.monotonic(), records)
+                self._finished_records += records
+        self.evict()
+
+    def evict(self):
+        """Drop finished tasks past their TTL or over the record limit"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for task_id, (finished_at, records) in list(self._finished.items()):
+                age = now - finished_at
+                over_limit = self._finished_records > self.max_finished and age >= TASK_MIN_RETENTION
+                if age < self.ttl and not over_limit:
+                    break
+                state = self._tasks.get(task_id)
+                children = state.get('children', ()) if state is not None else ()
+                if any(self._tasks[c]['status'] not in FINISHED_STATUSES for c in children if c in self._tasks):
+                    continue  # Cancelled playlist whose running entries haven't stopped yet
+                del self._finished[task_id]
+                self._finished_records -= records
+                for tid in (task_id, *children):
+                    self._tasks.pop(tid, None)
+                evicted.append((task_id, state, children))
+            self.evicted += len(evicted)
+        
+        for task_id, state, children in evicted:
+            for tid in (task_id, *children):
+                cancel_flags.pop(tid, None)
+                parent_publish_times.pop(tid, None)
+                event_broker.forget('task', tid)
+                task_changes.remove(tid)
+            if state is not None and state.get('status') in ('error', 'cancelled'):
+                finished_at = state.get('finished_at')
+                finished_at = datetime.fromisoformat(finished_at) if finished_at else datetime.now()
+                add_history_entry({
+                    'title': state.get('current_title') or state.get('url') or task_id,
+                    'path': '',
+                    'duration': '',
+                    'date': finished_at.strftime('%d/%m/%Y %H:%M'),
+                    'type': state.get('format_type', 'audio'),
+                    'size': '',
+                    'status': state['status'],
+                    'error': state.get('error', ''),
+                    'files': len(state.get('files', ())),
+                })
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tasks': len(self._tasks),
+                'finished': len(self._finished),
+                'finished_records': self._finished_records,
+                'max_finished': self.max_finished,
+                'ttl': self.ttl,
+                'evicted': self.evicted,
+            }
+
+
+active_downloads = TaskRegistry(TASK_RETENTION, TASK_MAX_FINISHED)  # task_id -> TaskState
+
+
+# ============== SCHEDULER ==============
+
+class DownloadScheduler:
+    """Priority scheduler for download tasks
+    
+    Pending jobs start in (priority desc, submission order) whenever the
+    global concurrency limit and the job's platform limit allow it.
+    Limits can be changed at runtime; pausing only stops new jobs from starting.
+    """
+
+    def __init__(self, max_workers, platform_limits=None):
+        self.max_workers = max_workers
+        self.platform_limits = dict(platform_limits or {})
+        self.paused = False
+        self._jobs = {}  # task_id -> pending job
+        self._pending = []  # sorted ((-priority, seq), task_id)
+        self._running = {}  # task_id -> running job
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    @staticmethod
+    def _order_key(job):
+        return (-job['priority'], job['seq'])
+
+    def _rebuild(self):
+        self._pending = sorted((self._order_key(j), t) for t, j in self._jobs.items())
+
+    def submit(self, task_id, fn, *args, priority=0, platform='unknown', on_start=None):
+        """Queue fn(*args) to run as task_id"""
+        job = {
+            'task_id': task_id,
+            'fn': fn,
+            'args': args,
+            'priority': priority,
+            'platform': platform,
+            'seq': next(self._seq),
+            'on_start': on_start,
+            'submitted_at': time.monotonic(),
+        }
+        with self._cond:
+            self._jobs[task_id] = job
+            bisect.insort(self._pending, (self._order_key(job), task_id))
+            self._cond.notify_all()
+
+    def cancel(self, task_id):
+        """Drop a job that hasn't started yet; returns True if it was pending"""
+        with self._cond:
+            if self._jobs.pop(task_id, None) is None:
+                return False
+            self._rebuild()
+            return True
+
+    def set_priority(self, task_id, priority):
+        """Change the priority of a pending job"""
+        with self._cond:
+            job = self._jobs.get(task_id)
+            if job is None:
+                return False
+            job['priority'] = priority
+            self._rebuild()
+            self._cond.notify_all()
+            return True
+
+    def reorder(self, task_ids):
+        """Put pending jobs in the given order, keeping the slots they occupied"""
+        with self._cond:
+            jobs = [self._jobs[t] for t in task_ids if t in self._jobs]
+            for job, seq in zip(jobs, sorted(j['seq'] for j in jobs)):
+                job['seq'] = seq
+            self._rebuild()
+            self._cond.notify_all()
+
+    def job_priority(self, task_id, default=0):
+        """Get the priority of a pending or running job"""
+        with self._cond:
+            job = self._jobs.get(task_id) or self._running.get(task_id)
+            return job['priority'] if job else default
+
+    def pause(self):
+        with self._cond:
+            self.paused = True
+
+    def resume(self):
+        with self._cond:
+            self.paused = False
+            self._cond.notify_all()
+
+    def configure(self, max_workers=None, platform_limits=None):
+        """Change the global and/or per-platform concurrency limits"""
+        with self._cond:
+            if max_workers is not None:
+                self.max_workers = max_workers
+            if platform_limits is not None:
+                self.platform_limits = dict(platform_limits)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """Get the scheduler state for the API"""
+        with self._cond:
+            return {
+                'paused': self.paused,
+                'max_parallel': self.max_workers,
+                'platform_limits': dict(self.platform_limits),
+                'running': [
+                    {'task_id': t, 'platform': j['platform'], 'priority': j['priority']}
+                    for t, j in self._running.items()
+                ],
+                'pending': [
+                    {'task_id': t, 'platform': self._jobs[t]['platform'], 'priority': self._jobs[t]['priority']}
+                    for _, t in self._pending
+                ],
+            }
+
+    def _take_next(self):
+        """Pop the first pending job allowed to start now (caller holds the lock)"""
+        if self.paused or len(self._running) >= self.max_workers:
+            return None
+        
+        running_per_platform = Counter(j['platform'] for j in self._running.values())
+        for index, (_, task_id) in enumerate(self._pending):
+            job = self._jobs[task_id]
+            limit = self.platform_limits.get(job['platform'])
+            if limit is not None and running_per_platform[job['platform']] >= limit:
+                continue
+            del self._pending[index]
+            del self._jobs[task_id]
+            return job
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                job = self._take_next()
+                while job is None:
+                    self._cond.wait()
+                    job = self._take_next()
+                self._running[job['task_id']] = job
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        metrics.observe('ytextractor_stage_seconds', time.monotonic() - job['submitted_at'],
+                        stage='queue', platform=job['platform'])
+        try:
+            if job['on_start']:
+                job['on_start'](job['task_id'])
+            job['fn'](*job['args'])
+        except Exception as e:
+            log_error(f"Scheduled task {job['task_id']} failed: {str(e)}")
+        finally:
+            with self._cond:
+                self._running.pop(job['task_id'], None)
+                self._cond.notify_all()
+
+
+class ConnectionBudget:
+    """Global cap on the HTTP connections used by running downloads
+    
+    A task asks for the connections it would like and gets what is left of
+    the budget. When the budget is used up it waits for a running task to
+    release some, so in_use never goes past the limit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, wanted, cancelled=None):
+        """Grant between 1 and `wanted` connections; returns 0 if cancelled() turned true while waiting"""
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_use >= self.limit:
+                    if cancelled is not None and cancelled():
+                        return 0
+                    self._cond.wait(0.25)
+            finally:
+                self.waiting -= 1
+            granted = min(wanted, self.limit - self.in_use)
+            self.in_use += granted
+            return granted
+
+    def release(self, granted):
+        with self._cond:
+            self.in_use -= granted
+            self._cond.notify_all()
+
+    def configure(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'limit': self.limit, 'in_use': self.in_use, 'waiting': self.waiting}
+
+
+def parse_bandwidth_schedule(windows):
+    """Validate a list of {'start': 'HH:MM', 'end': 'HH:MM', 'rate': bytes/s} windows"""
+    schedule = []
+    for window in windows:
+        start = datetime.strptime(window['start'], '%H:%M').time()
+        end = datetime.strptime(window['end'], '%H:%M').time()
+        rate = int(window['rate'])
+        if rate < 0:
+            raise ValueError('rate must be >= 0')
+        schedule.append({'start': start.strftime('%H:%M'), 'end': end.strftime('%H:%M'), 'rate': rate})
+    return schedule
+
+
+class BandwidthGovernor:
+    """Global download rate limit, split across running tasks by weight
+    
+    Each registered task has a token bucket refilled at its share of the
+    current limit (rate * weight / total weight). consume() charges the bytes
+    a task just received and returns how long it should sleep. Time-of-day
+    windows (end may be past midnight) override the base rate while active.
+    """
+
+    def __init__(self, rate, schedule, burst=BANDWIDTH_BURST):
+        self.rate = rate
+        self.schedule = schedule
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tasks = {}  # task_id -> {'weight', 'tokens', 'updated'}
+        self._total_weight = 0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self.measured = 0  # bytes/s over the last second
+
+    def current_rate(self):
+        now = datetime.now().strftime('%H:%M')
+        for window in self.schedule:
+            start, end = window['start'], window['end']
+            if (start <= now < end) if start <= end else (now >= start or now < end):
+                return window['rate']
+        return self.rate
+
+    def configure(self, rate=None, schedule=None):
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if schedule is not None:
+                self.schedule = schedule
+
+    def limited(self):
+        """Whether a limit or a scheduled window is configured (active now or not)"""
+        return bool(self.rate or any(window['rate'] for window in self.schedule))
+
+    def register(self, task_id, weight=1):
+        with self._lock:
+            self._tasks[task_id] = {'weight': weight, 'tokens': 0, 'updated': time.monotonic()}
+            self._total_weight += weight
+
+    def unregister(self, task_id):
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                self._total_weight -= task['weight']
+
+    def _share(self, task, rate):
+        return rate * task['weight'] / self._total_weight
+
+    def consume(self, task_id, nbytes):
+        """Charge received bytes to a task; returns the seconds it should wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._window_bytes += nbytes
+            if now - self._window_start >= 1:
+                self.measured = self._window_bytes / (now - self._window_start)
+                self._window_start = now
+                self._window_bytes = 0
+            
+            rate = self.current_rate()
+            task = self._tasks.get(task_id)
+            if not rate or task is None:
+                return 0
+            share = self._share(task, rate)
+            task['tokens'] = min(share * self.burst, task['tokens'] + (now - task['updated']) * share)
+            task['updated'] = now
+            task['tokens'] -= nbytes
+            return -task['tokens'] / share if task['tokens'] < 0 else 0
+
+    def task_limit(self, task_id):
+        """Get a task's current share in bytes/s (0 if unlimited)"""
+        with self._lock:
+            rate = self.current_rate()
+            task = self._tasks.get(task_id)
+            return self._share(task, rate) if rate and task else 0
+
+    def headroom(self):
+        """Get the unused part of the current limit in bytes/s (None if unlimited)"""
+        rate = self.current_rate()
+        if not rate:
+            return None
+        if time.monotonic() - self._window_start > 2:
+            return rate  # nothing downloaded recently
+        return max(0, rate - self.measured)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'current_rate': self.current_rate(),
+                'schedule': self.schedule,
+                'measured': round(self.measured),
+                'headroom': self.headroom(),
+                'tasks': {task_id: task['weight'] for task_id, task in self._tasks.items()},
+            }
+
+
+connection_budget = ConnectionBudget(MAX_TOTAL_CONNECTIONS)
+bandwidth_governor = BandwidthGovernor(BANDWIDTH_LIMIT, parse_bandwidth_schedule(BANDWIDTH_SCHEDULE))
+scheduler = DownloadScheduler(MAX_PARALLEL_DOWNLOADS, PLATFORM_CONCURRENCY_LIMITS)
+
+
+class PipelineStage:
+    """Bounded worker pool for one stage of the post-download pipeline
+    
+    submit() blocks while the stage already holds `capacity` jobs, so a slow
+    stage pushes back on the one feeding it instead of queueing without limit.
+    A job that fails is handed to on_error and goes no further.
+    """
+
+    def __init__(self, name, fn, workers, capacity, next_stage=None, on_error=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.capacity = capacity
+        self.next_stage = next_stage
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'pipeline-{name}')
+        self._slots = threading.BoundedSemaphore(capacity)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, job):
+        self._slots.acquire()
+        with self._lock:
+            self.queued += 1
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        error = None
+        start = time.perf_counter()
+        try:
+            self.fn(job)
+        except Exception as e:
+            error = e
+        finally:
+            metrics.observe('ytextractor_stage_seconds', time.perf_counter() - start,
+                            stage=self.name, platform=job.get('platform', 'unknown'))
+            if error is not None:
+                metrics.inc('ytextractor_stage_errors_total', stage=self.name)
+            with self._lock:
+                self.active -= 1
+                self.processed += 1
+                if error is not None:
+                    self.failed += 1
+            self._slots.release()
+        
+        if error is not None:
+            if self.on_error:
+                self.on_error(job, error)
+        elif self.next_stage:
+            self.next_stage.submit(job)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'queued': self.queued,
+                'active': self.active,
+                'processed': self.processed,
+                'failed': self.failed,
+            }
 
 
 # ============== HELPER FUNCTIONS ==============
@@ -95,24 +1088,168 @@ def log_error(error_msg):
         pass
 
 
+# ============== HISTORY STORE ==============
+
+class HistoryStore:
+    """Append-only JSON-lines history log with group commit
+    
+    append() only queues an entry; a background thread writes everything
+    queued since its last pass with one write and one fsync. Once the log
+    passes compact_threshold lines it is rewritten atomically with only the
+    newest `limit` downloads and `failed_limit` failed/cancelled task
+    summaries. Entries are stored oldest first.
+    """
+
+    def __init__(self, path, limit, failed_limit, flush_interval, compact_threshold):
+        self.path = Path(path)
+        self.limit = limit
+        self.failed_limit = failed_limit
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        self._pending = []
+        self._cond = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._lines = 0
+        self._writer = None
+
+    def load(self):
+        """Stream the log and return the newest entries within the limits, newest first"""
+        with self._file_lock:
+            return self._read()
+
+    def _read(self):
+        """Read the newest entries within the limits, newest first (caller holds _file_lock)"""
+        recent = deque(maxlen=self.limit)
+        failed = deque(maxlen=self.failed_limit)
+        lines = 0
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line after a crash
+                    (failed if is_failed_history_entry(entry) else recent).append((lines, entry))
+        self._lines = lines
+        return [entry for _, entry in sorted([*recent, *failed], key=lambda item: item[0], reverse=True)]
+
+    def append(self, entry):
+        with self._cond:
+            self._pending.append(entry)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+                self._writer.start()
+            self._cond.notify()
+
+    def flush(self):
+        """Write all queued entries now"""
+        # Taking the batch under the file lock keeps a concurrent clear() from
+        # being followed by entries queued before it
+        with self._file_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            data = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in batch)
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._lines += len(batch)
+            except OSError as e:
+                log_error(f"History write error: {str(e)}")
+
+    def rewrite(self, entries):
+        """Atomically replace the log with entries (oldest first)"""
+        with self._file_lock:
+            self._rewrite(entries)
+
+    def _rewrite(self, entries):
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._lines = len(entries)
+        except OSError as e:
+            log_error(f"History rewrite error: {str(e)}")
+
+    def clear(self):
+        with self._file_lock:
+            with self._cond:
+                self._pending = []
+            self._rewrite([])
+
+    def compact(self):
+        """Drop entries past the limits from the log"""
+        # Read and replace under one lock hold so a clear() can't slip in between
+        with self._file_lock:
+            self._rewrite(list(reversed(self._read())))
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let concurrent appends pile up so they share one write
+            time.sleep(self.flush_interval)
+            self.flush()
+            if self._lines > self.compact_threshold:
+                self.compact()
+
+
+history_store = HistoryStore(HISTORY_LOG_FILE, HISTORY_LIMIT, HISTORY_FAILED_LIMIT,
+                             HISTORY_FLUSH_INTERVAL, HISTORY_COMPACT_THRESHOLD)
+atexit.register(history_store.flush)
+
+
 def load_history():
-    """Load download history from JSON file"""
+    """Load download history from the history log"""
     global download_history
     try:
-        if HISTORY_FILE.exists():
+        if not HISTORY_LOG_FILE.exists() and HISTORY_FILE.exists():
+            # One-time migration from the old history.json (newest first)
             with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                download_history = json.load(f)
+                history_store.rewrite(list(reversed(json.load(f))))
+        download_history = history_store.load()
     except Exception:
         download_history = []
 
 
-def save_history():
-    """Save download history to JSON file"""
-    try:
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(download_history[:100], f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+def is_failed_history_entry(entry):
+    """Whether a history entry summarizes a failed or cancelled task rather than a download"""
+    return entry.get('status') in ('error', 'cancelled')
+
+
+def trim_history(entries):
+    """Keep the newest HISTORY_LIMIT downloads and HISTORY_FAILED_LIMIT failures (newest first, in place)"""
+    downloads = failures = 0
+    kept = []
+    for entry in entries:
+        if is_failed_history_entry(entry):
+            failures += 1
+            if failures > HISTORY_FAILED_LIMIT:
+                continue
+        else:
+            downloads += 1
+            if downloads > HISTORY_LIMIT:
+                continue
+        kept.append(entry)
+    entries[:] = kept
+
+
+def add_history_entry(entry):
+    """Add an entry to the in-memory history and queue it for the log"""
+    with queue_lock:
+        download_history.insert(0, entry)
+        trim_history(download_history)
+    history_store.append(entry)
+    event_broker.broadcast('history', next(history_event_seq), entry)
 
 
 def send_notification(title, message):
@@ -144,51 +1281,72 @@ def sanitize_filename(filename):
     return re.sub(r'[<>:"/\\|?*]', '', filename)
 
 
+# Hosts (and their subdomains) of each supported platform
+PLATFORM_HOSTS = {
+    'youtube.com': 'youtube', 'youtu.be': 'youtube',
+    'tiktok.com': 'tiktok',
+    'soundcloud.com': 'soundcloud',
+    'vimeo.com': 'vimeo',
+    'dailymotion.com': 'dailymotion', 'dai.ly': 'dailymotion',
+    'instagram.com': 'instagram', 'instagr.am': 'instagram',
+    'twitter.com': 'twitter', 'x.com': 'twitter',
+    'facebook.com': 'facebook', 'fb.watch': 'facebook', 'fb.com': 'facebook',
+    'twitch.tv': 'twitch',
+    'reddit.com': 'reddit', 'redd.it': 'reddit',
+    'pinterest.com': 'pinterest',
+    'bandcamp.com': 'bandcamp',
+    'bilibili.com': 'bilibili', 'b23.tv': 'bilibili',
+    'spotify.com': 'spotify',
+    'tumblr.com': 'tumblr',
+    'linkedin.com': 'linkedin',
+    'ted.com': 'ted',
+}
+
+# One pass over a youtube.com path+query; the named group that matched is the URL type
+YOUTUBE_PATH_PATTERN = re.compile(
+    r'/(?:'
+    r'shorts/(?P<short>[a-zA-Z0-9_-]{11})'
+    r'|(?:watch\?(?:[^#]*&)?v=|v/)(?P<video>[a-zA-Z0-9_-]{11})'
+    r'|playlist\?(?:[^#]*&)?list=(?P<playlist>[a-zA-Z0-9_-]+)'
+    r'|(?:c/|channel/|@)(?P<channel>[a-zA-Z0-9_-]+)'
+    r'|live/(?P<live>[a-zA-Z0-9_-]{11})'
+    r')',
+    re.IGNORECASE,
+)
+YOUTU_BE_PATTERN = re.compile(r'/(?P<short>[a-zA-Z0-9_-]{11})')
+# Optional scheme and credentials, then the host; 'rest' is the path and query
+URL_HOST_PATTERN = re.compile(
+    r'(?:(?:[a-zA-Z][a-zA-Z0-9+.-]*:)?//)?(?:[^/?#@]*@)?(?P<host>[^/?#:]*)(?::[0-9]*)?(?P<rest>[^#]*)'
+)
+
+
+def url_host(url):
+    """Get the lowercased host of a URL, accepting URLs without a scheme"""
+    return URL_HOST_PATTERN.match(url.strip()).group('host').lower().rstrip('.')
+
+
+def host_platform(host):
+    """Find the platform of a host or of its closest listed parent domain"""
+    while host:
+        platform = PLATFORM_HOSTS.get(host)
+        if platform is not None:
+            return platform
+        _, _, host = host.partition('.')
+    return 'unknown'
+
+
 def detect_url_type(url):
     """Detect the type and platform of media URL"""
-    url = url.strip().lower()
-    
-    # Platform detection - Extended for multi-platform support
-    platform_patterns = {
-        'youtube': r'(?:youtube\.com|youtu\.be)',
-        'tiktok': r'(?:tiktok\.com|vm\.tiktok\.com)',
-        'soundcloud': r'soundcloud\.com',
-        'vimeo': r'vimeo\.com',
-        'dailymotion': r'(?:dailymotion\.com|dai\.ly)',
-        'instagram': r'(?:instagram\.com|instagr\.am)',
-        'twitter': r'(?:twitter\.com|x\.com)',
-        'facebook': r'(?:facebook\.com|fb\.watch|fb\.com)',
-        'twitch': r'(?:twitch\.tv|clips\.twitch\.tv)',
-        'reddit': r'(?:reddit\.com|v\.redd\.it)',
-        'pinterest': r'pinterest\.com',
-        'bandcamp': r'bandcamp\.com',
-        'bilibili': r'(?:bilibili\.com|b23\.tv)',
-        'spotify': r'(?:spotify\.com|open\.spotify\.com)',
-        'tumblr': r'tumblr\.com',
-        'linkedin': r'linkedin\.com',
-        'ted': r'(?:ted\.com|tedtalks)',
-    }
-    
-    platform = 'unknown'
-    for plat, pattern in platform_patterns.items():
-        if re.search(pattern, url):
-            platform = plat
-            break
-    
-    # YouTube-specific patterns
-    youtube_patterns = {
-        'short': r'(?:youtu\.be/|youtube\.com/shorts/)([a-zA-Z0-9_-]{11})',
-        'video': r'(?:youtube\.com/watch\?v=|youtube\.com/v/)([a-zA-Z0-9_-]{11})',
-        'playlist': r'youtube\.com/playlist\?list=([a-zA-Z0-9_-]+)',
-        'channel': r'youtube\.com/(?:c/|channel/|@)([a-zA-Z0-9_-]+)',
-        'live': r'youtube\.com/live/([a-zA-Z0-9_-]{11})',
-    }
+    match = URL_HOST_PATTERN.match(url.strip())  # matches any string
+    host = match.group('host').lower().rstrip('.')
+    platform = host_platform(host)
     
+    # YouTube ids are case-sensitive: match on the original path and query
     if platform == 'youtube':
-        for url_type, pattern in youtube_patterns.items():
-            match = re.search(pattern, url)
-            if match:
-                return {'type': url_type, 'id': match.group(1), 'platform': 'youtube'}
+        pattern = YOUTU_BE_PATTERN if host.endswith('youtu.be') else YOUTUBE_PATH_PATTERN
+        match = pattern.match(match.group('rest'))
+        if match:
+            return {'type': match.lastgroup, 'id': match.group(match.lastgroup), 'platform': 'youtube'}
     
     # For other platforms, just return the platform
     return {'type': 'video', 'id': None, 'platform': platform}
@@ -200,6 +1358,9 @@ def add_id3_tags(mp3_path, title, artist, thumbnail_url=None):
         return
     
     try:
+        from mutagen.mp3 import MP3
+        from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, ID3NoHeaderError
+        
         try:
             audio = MP3(mp3_path, ID3=ID3)
         except ID3NoHeaderError:
@@ -210,17 +1371,17 @@ def add_id3_tags(mp3_path, title, artist, thumbnail_url=None):
         audio.tags.add(TPE1(encoding=3, text=artist))
         audio.tags.add(TALB(encoding=3, text="YouTube Download"))
         
-        # Download and embed thumbnail
+        # Embed thumbnail (usually prefetched while the audio downloaded)
         if thumbnail_url:
             try:
-                response = requests.get(thumbnail_url, timeout=10)
-                if response.status_code == 200:
+                data = thumbnail_cache.fetch(thumbnail_url)
+                if data:
                     audio.tags.add(APIC(
                         encoding=3,
                         mime='image/jpeg',
                         type=3,
                         desc='Cover',
-                        data=response.content
+                        data=data
                     ))
             except Exception:
                 pass
@@ -255,58 +1416,476 @@ def format_size(bytes_size):
     return f"{bytes_size:.1f} TB"
 
 
-def get_platform_ydl_opts(url=''):
-    """Get platform-specific yt-dlp options for better compatibility"""
-    opts = {
-        # Realistic User-Agent to avoid blocks from Instagram, Twitter, etc.
-        'http_headers': {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-        },
-        # General robustness options
-        'socket_timeout': 30,
-        'retries': 5,
-        'fragment_retries': 5,
-        'extractor_retries': 3,
-        'geo_bypass': True,
-    }
-    
-    url_lower = url.lower() if url else ''
-    
-    # Instagram-specific options
-    if 'instagram.com' in url_lower or 'instagr.am' in url_lower:
-        opts['extractor_args'] = {'instagram': {'skip': ['dash']}}
-    
-    # Twitter/X-specific options
-    if 'twitter.com' in url_lower or 'x.com' in url_lower:
-        opts['extractor_args'] = {'twitter': {'legacy_api': ['true']}}
-    
-    return opts
+# ============== HTTP CLIENT ==============
 
+def create_http_session():
+    """Shared session for auxiliary requests (thumbnails, update checks)"""
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=1)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = f"YouTubeExtractor/{APP_VERSION}"
+    return session
 
-def get_video_info(url):
-    """Get video/playlist information without downloading"""
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': 'in_playlist',
-        # Ensure no playlist limits
-        'playliststart': 1,
-        'playlistend': None,  # No end limit - get all videos
-        'ignoreerrors': True,  # Continue on individual video errors
-    }
-    
-    # Add platform-specific options (User-Agent, etc.)
-    ydl_opts.update(get_platform_ydl_opts(url))
+
+http_session = LazyProxy(create_http_session)
+
+
+class ThumbnailCache:
+    """Size-bounded on-disk thumbnail cache, content-addressed with LRU eviction
     
-    # Explicitly set ffmpeg location
-    ffmpeg_loc = get_ffmpeg_path()
+    Images are stored once per SHA-256 of their bytes, so the same channel or
+    album art reached through different URLs takes one file. index.json maps
+    URLs to digests; blob mtimes record last use for eviction.
+    """
+
+    def __init__(self, directory, max_bytes, prefetch_workers=THUMBNAIL_PREFETCH_WORKERS):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None  # url -> digest, loaded on first use
+        self._blobs = OrderedDict()  # digest -> size, least recently used first
+        self._size = 0
+        self._pending = {}  # url -> Future of an in-flight fetch
+        self._executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix='thumbnail')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _blob_path(self, digest):
+        return self.directory / f"{digest}.img"
+
+    def _load(self):
+        """Read the index and the blobs on disk (caller holds the lock)"""
+        if self._index is not None:
+            return
+        self._index = {}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            blobs = sorted(self.directory.glob('*.img'), key=lambda p: p.stat().st_mtime)
+            for blob in blobs:
+                size = blob.stat().st_size
+                self._blobs[blob.stem] = size
+                self._size += size
+            index_path = self.directory / 'index.json'
+            if index_path.exists():
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    self._index = {url: digest for url, digest in json.load(f).items() if digest in self._blobs}
+        except (OSError, ValueError) as e:
+            log_error(f"Thumbnail cache load error: {str(e)}")
+
+    def _save_index(self):
+        tmp_path = self.directory / 'index.json.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.directory / 'index.json')
+        except OSError as e:
+            log_error(f"Thumbnail cache index error: {str(e)}")
+
+    def get(self, url):
+        """Return the cached image bytes for a URL, or None"""
+        with self._lock:
+            self._load()
+            digest = self._index.get(url)
+            if digest is None or digest not in self._blobs:
+                self.misses += 1
+                return None
+            self._blobs.move_to_end(digest)
+            self.hits += 1
+            path = self._blob_path(digest)
+        try:
+            os.utime(path)
+            return path.read_bytes()
+        except OSError:
+            with self._lock:
+                self._drop(digest)
+            return None
+
+    def put(self, url, data):
+        """Store image bytes for a URL, evicting least recently used blobs"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._load()
+            if digest not in self._blobs:
+                try:
+                    tmp_path = self.directory / f"{digest}.tmp"
+                    tmp_path.write_bytes(data)
+                    os.replace(tmp_path, self._blob_path(digest))
+                except OSError as e:
+                    log_error(f"Thumbnail cache write error: {str(e)}")
+                    return
+                self._blobs[digest] = len(data)
+                self._size += len(data)
+            self._blobs.move_to_end(digest)
+            self._index[url] = digest
+            while self._size > self.max_bytes and len(self._blobs) > 1:
+                oldest = next(iter(self._blobs))
+                self._drop(oldest)
+                self.evictions += 1
+            self._save_index()
+
+    def _drop(self, digest):
+        """Forget a blob and the URLs pointing at it (caller holds the lock)"""
+        self._size -= self._blobs.pop(digest, 0)
+        for url in [u for u, d in self._index.items() if d == digest]:
+            del self._index[url]
+        try:
+            os.remove(self._blob_path(digest))
+        except OSError:
+            pass
+
+    def _download(self, url):
+        try:
+            response = http_session.get(url, timeout=HTTP_TIMEOUT)
+            if response.status_code != 200:
+                return None
+            data = response.content
+            self.put(url, data)
+            return data
+        except requests.RequestException:
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+
+    def _start(self, url):
+        """Return the Future for a fetch of url, starting one if none is running"""
+        with self._lock:
+            future = self._pending.get(url)
+            if future is None:
+                future = self._pending[url] = self._executor.submit(self._download, url)
+            return future
+
+    def prefetch(self, url):
+        """Fetch a thumbnail in the background if it isn't cached yet"""
+        if url and self.get(url) is None:
+            self._start(url)
+
+    def fetch(self, url):
+        """Return the image bytes, waiting for an in-flight prefetch or downloading them"""
+        data = self.get(url)
+        if data is not None:
+            return data
+        return self._start(url).result()
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            removed = len(self._blobs)
+            for digest in list(self._blobs):
+                self._drop(digest)
+            self._save_index()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {
+                'entries': len(self._blobs),
+                'urls': len(self._index),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'pending': len(self._pending),
+            }
+
+
+thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+
+
+# ============== BROWSER COOKIES ==============
+
+class _CookieLogger:
+    """Minimal yt-dlp logger so cookie extraction doesn't print to the console"""
+    def debug(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warning(self, message, only_once=False):
+        pass
+
+    def error(self, message):
+        log_error(f"Cookie extraction: {message}")
+
+    def progress_bar(self):
+        return None
+
+
+def get_cookie_db_path():
+    """Get the path of the browser's cookie database (None if not found)"""
+    if sys.platform == 'win32':
+        user_data = os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Google', 'Chrome', 'User Data')
+    elif sys.platform == 'darwin':
+        user_data = str(Path.home() / 'Library' / 'Application Support' / 'Google' / 'Chrome')
+    else:
+        user_data = str(Path.home() / '.config' / 'google-chrome')
+    
+    for candidate in (('Default', 'Network', 'Cookies'), ('Default', 'Cookies')):
+        path = os.path.join(user_data, *candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def get_shared_cookiejar(force=False):
+    """Get the process-wide browser cookie jar (None if cookies can't be loaded)
+    
+    The jar is reloaded when the cookie database changes or after
+    COOKIE_JAR_TTL; a failed load is remembered for COOKIE_JAR_RETRY seconds.
+    """
+    with cookie_jar_lock:
+        state = cookie_jar_state
+        now = time.monotonic()
+        age = now - state['loaded_at']
+        
+        if state['loaded_at'] and not force:
+            if state['jar'] is None:
+                if age < COOKIE_JAR_RETRY:
+                    return None
+            elif age < COOKIE_JAR_TTL:
+                db_path = get_cookie_db_path()
+                db_mtime = os.path.getmtime(db_path) if db_path else None
+                if db_mtime == state['db_mtime'] or age < COOKIE_JAR_MIN_RELOAD:
+                    return state['jar']
+        
+        db_path = get_cookie_db_path()
+        state['db_mtime'] = os.path.getmtime(db_path) if db_path else None
+        state['loaded_at'] = now
+        try:
+            from yt_dlp.cookies import extract_cookies_from_browser
+            state['jar'] = extract_cookies_from_browser(COOKIE_BROWSER, logger=_CookieLogger())
+            state['error'] = None
+        except Exception as e:
+            state['jar'] = None
+            state['error'] = str(e)
+            log_error("Could not load Chrome cookies (browser may be open). Continuing without cookies.")
+        return state['jar']
+
+
+def get_platform_ydl_opts(url=''):
+    """Get platform-specific yt-dlp options for better compatibility"""
+    opts = {
+        # Realistic User-Agent to avoid blocks from Instagram, Twitter, etc.
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+            'Accept-Language': 'en-US,en;q=0.9',
+        },
+        # General robustness options
+        'socket_timeout': 30,
+        'retries': 5,
+        'fragment_retries': 5,
+        'extractor_retries': 3,
+        'geo_bypass': True,
+        # Default parallel fragments for DASH/HLS downloads
+        'concurrent_fragment_downloads': 4,
+    }
+    
+    platform = host_platform(url_host(url)) if url else 'unknown'
+    
+    # Instagram-specific options
+    if platform == 'instagram':
+        opts['extractor_args'] = {'instagram': {'skip': ['dash']}}
+        opts['concurrent_fragment_downloads'] = 1  # Rate-limits aggressively
+    
+    # Twitter/X-specific options
+    if platform == 'twitter':
+        opts['extractor_args'] = {'twitter': {'legacy_api': ['true']}}
+    
+    if platform == 'tiktok':
+        opts['concurrent_fragment_downloads'] = 1
+    
+    return opts
+
+
+def parse_download_options(data):
+    """Read connection_mode/connections/bandwidth_weight/redownload/profile from a request payload
+    
+    Returns (options, error). Missing fields are left out so the platform
+    defaults from get_platform_ydl_opts apply.
+    """
+    options = {}
+    mode = data.get('connection_mode')
+    if mode is not None:
+        if mode not in CONNECTION_MODES:
+            return None, f"connection_mode must be one of: {', '.join(CONNECTION_MODES)}"
+        options['connection_mode'] = mode
+    connections = data.get('connections')
+    if connections is not None:
+        try:
+            connections = int(connections)
+        except (TypeError, ValueError):
+            return None, 'connections must be an integer'
+        if not 1 <= connections <= MAX_CONNECTIONS_PER_TASK:
+            return None, f'connections must be between 1 and {MAX_CONNECTIONS_PER_TASK}'
+        options['connections'] = connections
+    weight = data.get('bandwidth_weight')
+    if weight is not None:
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            return None, 'bandwidth_weight must be a number'
+        if weight <= 0:
+            return None, 'bandwidth_weight must be positive'
+        options['bandwidth_weight'] = weight
+    if data.get('redownload') in (True, 1, '1', 'true', 'on'):
+        options['redownload'] = True  # Ignore the download archive
+    if data.get('profile') in (True, 1, '1', 'true', 'on'):
+        options['profile'] = True  # cProfile + tracemalloc, see ProfileStore
+    return options, None
+
+
+def parse_priority(value):
+    """Read a task priority from a request value, clamped to the supported range
+    
+    Returns (priority, error).
+    """
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        return None, 'Priority must be an integer'
+    return max(MIN_PRIORITY, min(MAX_PRIORITY, priority)), None
+
+
+def connection_ydl_opts(mode, connections):
+    """Get the yt-dlp options for a connection mode and granted connection count"""
+    if mode == 'native':
+        return {'concurrent_fragment_downloads': 1}
+    if mode == 'external' and shutil.which(EXTERNAL_DOWNLOADER):
+        return {
+            'concurrent_fragment_downloads': connections,
+            'external_downloader': {'default': EXTERNAL_DOWNLOADER},
+            'external_downloader_args': {
+                EXTERNAL_DOWNLOADER: ['-x', str(connections), '-s', str(connections), '-k', '1M'],
+            },
+        }
+    return {'concurrent_fragment_downloads': connections}
+
+
+# ============== METADATA CACHE ==============
+
+def media_cache_key(url):
+    """Get the canonical (extractor, id) key for a URL without network access"""
+    global _extractor_classes
+    
+    key = metadata_url_aliases.get(url)
+    if key is not None:
+        return key
+    
+    if _extractor_classes is None:
+        from yt_dlp.extractor import gen_extractor_classes
+        _extractor_classes = [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+    
+    # Same matching order yt-dlp uses to pick an extractor
+    for ie in _extractor_classes:
+        if ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            return (ie.ie_key(), video_id) if video_id else None
+    return None
+
+
+def signed_url_ttl(info):
+    """Get seconds until the earliest signed format URL expires (None if unsigned)"""
+    expiries = []
+    for fmt in info.get('formats') or []:
+        match = re.search(r'[?&/]expire[=/](\d+)', (fmt or {}).get('url') or '')
+        if match:
+            expiries.append(int(match.group(1)))
+    if not expiries:
+        return None
+    return min(expiries) - time.time()
+
+
+def cache_media_info(url, info):
+    """Store a raw single-video info dict in the metadata cache"""
+    if info.get('_type', 'video') != 'video' or info.get('is_live'):
+        return
+    if not info.get('id') or not info.get('extractor_key'):
+        return
+    
+    ttl = METADATA_CACHE_TTL
+    remaining = signed_url_ttl(info)
+    if remaining is not None:
+        ttl = min(ttl, remaining - METADATA_EXPIRY_MARGIN)
+    if ttl <= 0:
+        return
+    
+    try:
+        snapshot = copy.deepcopy(info)
+    except Exception:
+        return
+    
+    key = (info['extractor_key'], info['id'])
+    metadata_cache.set(key, snapshot, ttl)
+    metadata_url_aliases.set(url, key, ttl)
+    if info.get('webpage_url'):
+        metadata_url_aliases.set(info['webpage_url'], key, ttl)
+
+
+def invalidate_media_info(url):
+    """Drop the cached info for a URL (e.g. after its stream URLs stopped working)"""
+    key = media_cache_key(url)
+    if key is not None:
+        metadata_cache.invalidate(lambda k: k == key)
+
+
+def extract_raw_info(ydl, url):
+    """Get the unprocessed info dict for a URL, from the metadata cache if possible
+    
+    Returns (info, from_cache). The info dict is a private copy the caller
+    may hand to ydl.process_ie_result.
+    """
+    key = media_cache_key(url)
+    raw = metadata_cache.get(key) if key is not None else None
+    if raw is not None:
+        return copy.deepcopy(raw), True
+    
+    info = ydl.extract_info(url, download=False, process=False)
+    if info is not None:
+        cache_media_info(url, info)
+    return info, False
+
+
+def extract_info_cached(ydl, url, download=False):
+    """Run ydl.extract_info through the shared metadata cache
+    
+    The raw extraction result is cached and re-processed with the calling
+    YoutubeDL's own options (format selection, postprocessors, download).
+    """
+    info, _ = extract_raw_info(ydl, url)
+    if info is None:
+        return None
+    return ydl.process_ie_result(info, download=download)
+
+
+def get_video_info(url):
+    """Get video/playlist information without downloading"""
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        # Ensure no playlist limits
+        'playliststart': 1,
+        'playlistend': None,  # No end limit - get all videos
+        'ignoreerrors': True,  # Continue on individual video errors
+    }
+    
+    # Add platform-specific options (User-Agent, etc.)
+    ydl_opts.update(get_platform_ydl_opts(url))
+    
+    # Explicitly set ffmpeg location
+    ffmpeg_loc = get_ffmpeg_path()
     if ffmpeg_loc:
         ydl_opts['ffmpeg_location'] = ffmpeg_loc
     
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+            info = extract_info_cached(ydl, url)
             
             # Guard against None result
             if info is None:
@@ -382,10 +1961,55 @@ def get_available_formats(info):
     return formats[:6]
 
 
+def build_search_query(query, platform, count):
+    """Build the yt-dlp search pseudo-URL for a platform"""
+    if platform == 'soundcloud':
+        return f'scsearch{count}:{query}'
+    elif platform == 'dailymotion':
+        return f'dmsearch{count}:{query}'
+    # Default to YouTube
+    return f'ytsearch{count}:{query}'
+
+
+def search_entry_to_result(entry, platform):
+    """Convert a yt-dlp search entry to the result dict sent to the UI"""
+    if not entry:
+        return None
+    video_id = entry.get('id', '')
+    title = entry.get('title', '')
+    if not (video_id and title):
+        return None
+    
+    # Build URL based on platform
+    if platform == 'soundcloud':
+        url = entry.get('webpage_url') or entry.get('url', '')
+        thumbnail = entry.get('thumbnail', '')
+    else:
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        thumbnail = entry.get('thumbnail') or f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+    
+    return {
+        'id': video_id,
+        'title': title,
+        'duration': entry.get('duration', 0),
+        'duration_formatted': format_duration(entry.get('duration', 0)),
+        'thumbnail': thumbnail,
+        'uploader': entry.get('uploader') or entry.get('channel') or 'Unknown',
+        'url': url,
+        'platform': platform,
+    }
+
+
 def search_media(query, platform='youtube', max_results=50):
     """Search for videos/tracks using yt-dlp library with thread isolation"""
     from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
     
+    # Paging through the same query is served from the cache
+    cache_key = (normalize_search_query(query), platform, max_results)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     def _do_search():
         ydl_opts = {
             'quiet': True,
@@ -400,46 +2024,16 @@ def search_media(query, platform='youtube', max_results=50):
             ydl_opts['ffmpeg_location'] = ffmpeg_loc
         
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Build search query based on platform
-            if platform == 'soundcloud':
-                search_query = f'scsearch{max_results}:{query}'
-            elif platform == 'dailymotion':
-                search_query = f'dmsearch{max_results}:{query}'
-            else:  # Default to YouTube
-                search_query = f'ytsearch{max_results}:{query}'
-            
-            results = ydl.extract_info(search_query, download=False)
+            results = ydl.extract_info(build_search_query(query, platform, max_results), download=False)
             
             if not results:
                 return []
             
             videos = []
-            entries = results.get('entries', [])
-            
-            for entry in entries:
-                if entry:
-                    video_id = entry.get('id', '')
-                    title = entry.get('title', '')
-                    
-                    if video_id and title:
-                        # Build URL based on platform
-                        if platform == 'soundcloud':
-                            url = entry.get('webpage_url') or entry.get('url', '')
-                            thumbnail = entry.get('thumbnail', '')
-                        else:
-                            url = f"https://www.youtube.com/watch?v={video_id}"
-                            thumbnail = entry.get('thumbnail') or f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
-                        
-                        videos.append({
-                            'id': video_id,
-                            'title': title,
-                            'duration': entry.get('duration', 0),
-                            'duration_formatted': format_duration(entry.get('duration', 0)),
-                            'thumbnail': thumbnail,
-                            'uploader': entry.get('uploader') or entry.get('channel') or 'Unknown',
-                            'url': url,
-                            'platform': platform,
-                        })
+            for entry in results.get('entries', []):
+                video = search_entry_to_result(entry, platform)
+                if video:
+                    videos.append(video)
             return videos
     
     try:
@@ -447,41 +2041,1519 @@ def search_media(query, platform='youtube', max_results=50):
         with ThreadPoolExecutor(max_workers=1) as search_executor:
             future = search_executor.submit(_do_search)
             videos = future.result(timeout=120)
-            return {'results': videos, 'total': len(videos)}
+            result = {'results': videos, 'total': len(videos)}
+            search_cache.set(cache_key, result)
+            return result
+    except FuturesTimeoutError:
+        return {'error': 'Search timeout', 'results': [], 'total': 0}
+    except Exception as e:
+        log_error(f"Search error: {str(e)}")
+        return {'error': str(e), 'results': [], 'total': 0}
+
+
+def search_media_page(query, platform='youtube', page=1, per_page=SEARCH_PER_PAGE, max_results=50):
+    """Incremental search: fetch only the entries needed for one page (plus lookahead)
+    
+    Returns every result known so far; the caller slices out the page. Results
+    are kept in the search cache and grown on demand as the user pages forward.
+    """
+    from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+    
+    needed = min(page * per_page + SEARCH_LOOKAHEAD, max_results)
+    cache_key = (normalize_search_query(query), platform, 'incremental')
+    cached = search_cache.get(cache_key)
+    if cached is not None and (cached['complete'] or len(cached['results']) >= needed):
+        enrich_search_results(cached['results'][(page - 1) * per_page:page * per_page])
+        return cached
+    
+    def _do_search():
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            # Flat entries already carry title/duration on these platforms,
+            # so nothing is resolved beyond the search listing itself
+            'extract_flat': 'in_playlist' if platform in FLAT_SEARCH_PLATFORMS else False,
+            'noplaylist': True,
+        }
+        
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            results = ydl.extract_info(build_search_query(query, platform, needed), download=False)
+            if not results:
+                return [], 0
+            entries = list(results.get('entries') or [])
+            return [search_entry_to_result(e, platform) for e in entries], len(entries)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=1) as search_executor:
+            future = search_executor.submit(_do_search)
+            videos, fetched = future.result(timeout=120)
     except FuturesTimeoutError:
         return {'error': 'Search timeout', 'results': [], 'total': 0}
     except Exception as e:
         log_error(f"Search error: {str(e)}")
         return {'error': str(e), 'results': [], 'total': 0}
+    
+    # Keep entries (and any lazily filled fields) we already had for this query
+    known = {v['id']: v for v in (cached['results'] if cached else [])}
+    merged = []
+    for video in videos:
+        if video:
+            merged.append(known.get(video['id'], video))
+    
+    result = {
+        'results': merged,
+        'total': len(merged),
+        'complete': fetched < needed or needed >= max_results,
+    }
+    search_cache.set(cache_key, result)
+    enrich_search_results(merged[(page - 1) * per_page:page * per_page])
+    return result
+
+
+def enrich_search_results(videos):
+    """Fill in missing duration/thumbnail fields in the background"""
+    for video in videos:
+        if video.get('duration') and video.get('thumbnail'):
+            continue
+        key = (video.get('platform'), video.get('id'))
+        with search_enrich_lock:
+            if key in search_enrich_pending:
+                continue
+            search_enrich_pending.add(key)
+        search_enrich_executor.submit(_enrich_search_result, video, key)
+
+
+def _enrich_search_result(video, key):
+    """Resolve one search result and update its dict in place"""
+    try:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(video['url'], download=False, process=False)
+        
+        if info:
+            if not video.get('duration') and info.get('duration'):
+                video['duration'] = info['duration']
+                video['duration_formatted'] = format_duration(info['duration'])
+            if not video.get('thumbnail'):
+                thumbnails = info.get('thumbnails') or [{}]
+                video['thumbnail'] = info.get('thumbnail') or thumbnails[-1].get('url', '')
+    except Exception as e:
+        log_error(f"Search enrich error for {video.get('url')}: {str(e)}")
+    finally:
+        with search_enrich_lock:
+            search_enrich_pending.discard(key)
+
+
+# Keep old function name for compatibility
+def search_youtube(query, max_results=50):
+    return search_media(query, 'youtube', max_results)
+
+
+# ============== AUDIO PREVIEW ==============
+# /api/preview-audio resolves a track's stream once; the browser then plays it
+# through /api/preview/<id>/stream, which proxies Range requests upstream and
+# serves replays from the disk cache
+
+PREVIEW_ID_PATTERN = re.compile(r'[0-9a-f]{20}')
+UPSTREAM_TOTAL_PATTERN = re.compile(r'/(\d+)\s*$')
+
+preview_streams = TTLCache(PREVIEW_MAX_STREAMS, PREVIEW_STREAM_TTL)  # preview id -> stream entry
+preview_url_ids = TTLCache(PREVIEW_MAX_STREAMS * 2, PREVIEW_STREAM_TTL)  # page URL -> preview id
+preview_session = LazyProxy(create_http_session)  # Long-lived streams stay off the shared pool
+
+# Background resolution of preview streams for the search page being shown;
+# a new query cancels what is still queued for the previous one
+preview_prefetch_executor = ThreadPoolExecutor(max_workers=PREVIEW_PREFETCH_WORKERS,
+                                               thread_name_prefix='preview-prefetch')
+preview_prefetch_state = {'query': None, 'futures': {}}  # futures: page URL -> Future
+preview_prefetch_lock = threading.Lock()
+
+
+class PreviewCache:
+    """Size-bounded on-disk cache of the first seconds of previewed tracks
+    
+    <id>.bin holds the start of the stream and <id>.json its total size,
+    content type and page URL, so a replay starts from disk while the rest is
+    fetched (re-resolving the stream after a restart). Least recently played
+    tracks are dropped once the cache passes max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, preview_id):
+        """Return the cached meta (with 'path' and 'length' of the cached bytes), or None"""
+        path = self.directory / f'{preview_id}.bin'
+        try:
+            with open(self.directory / f'{preview_id}.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            os.utime(path)  # Recently played tracks are evicted last
+            meta['length'] = os.path.getsize(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        meta['path'] = path
+        return meta
+
+    def put(self, preview_id, data, meta):
+        with self._lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                temp_path = self.directory / f'{preview_id}.bin.tmp'
+                temp_path.write_bytes(data)
+                os.replace(temp_path, self.directory / f'{preview_id}.bin')
+                with open(self.directory / f'{preview_id}.json', 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+                self._evict()
+            except OSError as e:
+                log_error(f"Preview cache write failed: {str(e)}")
+
+    def _evict(self):
+        blobs = sorted(self.directory.glob('*.bin'), key=lambda p: p.stat().st_mtime, reverse=True)
+        total = 0
+        for path in blobs:
+            total += path.stat().st_size
+            if total > self.max_bytes:
+                path.unlink(missing_ok=True)
+                path.with_suffix('.json').unlink(missing_ok=True)
+
+    def stats(self):
+        blobs = list(self.directory.glob('*.bin')) if self.directory.exists() else []
+        return {
+            'entries': len(blobs),
+            'bytes': sum(p.stat().st_size for p in blobs),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+preview_cache = PreviewCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)
+
+
+def preview_id_for(url, info):
+    """Stable id of a track's preview, shared by every URL of the same media"""
+    if info.get('extractor_key') and info.get('id'):
+        name = f"{info['extractor_key']}:{info['id']}"
+    else:
+        name = url
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:20]
+
+
+def cached_preview(url):
+    """Get the registered stream entry of a URL without extracting anything"""
+    preview_id = preview_url_ids.get(url)
+    if preview_id is None:
+        key = media_cache_key(url)
+        if key is None:
+            return None
+        preview_id = hashlib.sha1(f'{key[0]}:{key[1]}'.encode('utf-8')).hexdigest()[:20]
+    return preview_streams.get(preview_id)
+
+
+def pick_preview_format(info):
+    """Pick the first format with audio, preferring plain HTTP ones the proxy can serve"""
+    with_audio = [f for f in info.get('formats') or [] if f.get('acodec') != 'none' and f.get('url')]
+    for fmt in with_audio:
+        if fmt.get('protocol', 'https') in ('http', 'https'):
+            return fmt
+    if with_audio:
+        return with_audio[0]
+    return info if info.get('url') else None
+
+
+def resolve_preview(url, refresh=False):
+    """Extract the audio stream of a URL and register it under its preview id
+    
+    Returns the stream entry, or None if the URL has no playable audio.
+    refresh=True bypasses the metadata cache (e.g. after the stream URL expired).
+    """
+    if refresh:
+        invalidate_media_info(url)
+    
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'format': 'bestaudio/best',
+        'skip_download': True,
+    }
+    
+    # Explicitly set ffmpeg location
+    ffmpeg_loc = get_ffmpeg_path()
+    if ffmpeg_loc:
+        ydl_opts['ffmpeg_location'] = ffmpeg_loc
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = extract_info_cached(ydl, url)
+    if not info:
+        return None
+    fmt = pick_preview_format(info)
+    if fmt is None:
+        return None
+    
+    entry = {
+        'id': preview_id_for(url, info),
+        'page_url': url,
+        'stream_url': fmt['url'],
+        'headers': dict(fmt.get('http_headers') or info.get('http_headers') or {}),
+        'proxied': fmt.get('protocol', 'https') in ('http', 'https'),
+        'abr': fmt.get('abr') or fmt.get('tbr'),
+        'title': info.get('title', 'Unknown'),
+        'duration': info.get('duration') or 0,
+    }
+    ttl = PREVIEW_STREAM_TTL
+    remaining = signed_url_ttl(info)
+    if remaining is not None:
+        ttl = max(1, min(ttl, remaining - METADATA_EXPIRY_MARGIN))
+    preview_streams.set(entry['id'], entry, ttl)
+    for page_url in {url, info.get('webpage_url'), info.get('original_url')} - {None}:
+        preview_url_ids.set(page_url, entry['id'], ttl)
+    return entry
+
+
+def prefetch_previews(query_key, videos):
+    """Resolve the preview streams of the first PREVIEW_PREFETCH_COUNT results in the background"""
+    with preview_prefetch_lock:
+        if preview_prefetch_state['query'] != query_key:
+            for future in preview_prefetch_state['futures'].values():
+                future.cancel()  # Only stops prefetches that haven't started
+            preview_prefetch_state['query'] = query_key
+            preview_prefetch_state['futures'] = {}
+        futures = preview_prefetch_state['futures']
+        for video in videos[:PREVIEW_PREFETCH_COUNT]:
+            url = video.get('url')
+            if not url or url in futures:
+                continue
+            futures[url] = preview_prefetch_executor.submit(_prefetch_preview, query_key, url)
+
+
+def _prefetch_preview(query_key, url):
+    """Resolve one preview stream, unless the user already moved to another query"""
+    if preview_prefetch_state['query'] != query_key or cached_preview(url) is not None:
+        return
+    try:
+        resolve_preview(url)
+    except Exception as e:
+        log_error(f"Preview prefetch error for {url}: {str(e)}")
+
+
+def open_preview_upstream(entry, start, end=None):
+    """GET a preview stream from byte `start`, re-resolving it once if the URL stopped working
+    
+    Returns (response, entry); response is None if the stream is unavailable.
+    """
+    for attempt in range(2):
+        headers = dict(entry['headers'])
+        headers['Range'] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = preview_session.get(entry['stream_url'], headers=headers, stream=True, timeout=HTTP_TIMEOUT)
+            if response.status_code in (200, 206, 416):
+                return response, entry
+            response.close()
+        except requests.RequestException as e:
+            log_error(f"Preview stream request failed: {str(e)}")
+        if attempt == 0:
+            # Signed stream URLs expire (403/404/410): extract a fresh one
+            entry = resolve_preview(entry['page_url'], refresh=True)
+            if entry is None:
+                break
+    return None, entry
+
+
+def iter_preview_upstream(response, start, length=None):
+    """Stream an upstream response, skipping to `start` if it ignored the Range header"""
+    skip = start if response.status_code == 200 else 0
+    try:
+        for chunk in response.iter_content(PREVIEW_CHUNK_SIZE):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            if length is not None:
+                chunk = chunk[:length]
+                length -= len(chunk)
+            if chunk:
+                yield chunk
+            if length == 0:
+                break
+    finally:
+        response.close()
+
+
+def preview_prefix_bytes(entry, total):
+    """Bytes covering the first PREVIEW_CACHE_SECONDS of a stream"""
+    if entry['duration']:
+        wanted = total * PREVIEW_CACHE_SECONDS / entry['duration']
+    elif entry['abr']:
+        wanted = entry['abr'] * 125 * PREVIEW_CACHE_SECONDS  # kbit/s -> bytes
+    else:
+        wanted = PREVIEW_PREFIX_MAX_BYTES
+    return int(min(wanted, PREVIEW_PREFIX_MAX_BYTES, total))
+
+
+def preview_cached_body(preview_id, cached, start, end):
+    """Bytes start..end of a track: the cached start from disk, the rest from upstream"""
+    cached_end = min(end, cached['length'] - 1)
+    with open(cached['path'], 'rb') as f:
+        f.seek(start)
+        remaining = cached_end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(PREVIEW_CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+    if cached_end >= end:
+        return
+    
+    # The upstream URL is only needed (and resolved) once playback gets past the cache
+    entry = preview_streams.get(preview_id) or resolve_preview(cached['page_url'])
+    if entry is None:
+        return
+    response, _ = open_preview_upstream(entry, cached_end + 1, end)
+    if response is None or response.status_code == 416:
+        return
+    yield from iter_preview_upstream(response, cached_end + 1, end - cached_end)
+
+
+def preview_upstream_body(preview_id, entry, response, start, length, total, content_type):
+    """Stream an upstream response, caching the start of the track on the way"""
+    collect = preview_prefix_bytes(entry, total) if start == 0 and total else 0
+    prefix = bytearray()
+    for chunk in iter_preview_upstream(response, start, length):
+        if collect:
+            prefix += chunk[:collect - len(prefix)]
+            if len(prefix) >= collect:
+                preview_cache.put(preview_id, bytes(prefix), {
+                    'size': total,
+                    'content_type': content_type,
+                    'page_url': entry['page_url'],
+                })
+                collect = 0
+        yield chunk
+
+
+def preview_response(body, start, end, total, content_type, ranged):
+    """Response for bytes start..end of a preview (whole stream if total is unknown)"""
+    headers = {'Accept-Ranges': 'bytes', 'Cache-Control': 'no-store'}
+    status = 200
+    if total is not None:
+        headers['Content-Length'] = str(end - start + 1)
+        if ranged:
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{total}'
+    return Response(body, status=status, headers=headers, content_type=content_type, direct_passthrough=True)
+
+
+# ============== WARM-UP ==============
+
+warmup_state = {'status': 'idle', 'seconds': None, 'error': None}
+warmup_lock = threading.Lock()
+
+
+def warm_up():
+    """Load what the first search or download would otherwise wait for"""
+    started = time.perf_counter()
+    try:
+        yt_dlp.YoutubeDL
+        # Walks every extractor once, compiling their URL patterns
+        media_cache_key('https://warmup.invalid/')
+        http_session.headers
+        if MUTAGEN_AVAILABLE:
+            import mutagen.mp3  # noqa: F401
+        warmup_state['status'] = 'done'
+    except Exception as e:
+        warmup_state['status'] = 'error'
+        warmup_state['error'] = str(e)
+        log_error(f"Warm-up failed: {str(e)}")
+    warmup_state['seconds'] = round(time.perf_counter() - started, 3)
+
+
+def start_warm_up():
+    """Run warm_up() once, in the background"""
+    with warmup_lock:
+        if warmup_state['status'] != 'idle':
+            return False
+        warmup_state['status'] = 'running'
+    threading.Thread(target=warm_up, daemon=True, name='warm-up').start()
+    return True
+
+
+# ============== JOB STORE ==============
+
+JOB_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_items (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    url TEXT NOT NULL,
+    output_folder TEXT NOT NULL,
+    format_type TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    normalize INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    title TEXT,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    options TEXT,
+    files TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+CREATE INDEX IF NOT EXISTS tasks_parent ON tasks (parent_id);
+CREATE TABLE IF NOT EXISTS archive (
+    extractor TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    format_type TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    title TEXT,
+    path TEXT NOT NULL,
+    url TEXT,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (extractor, video_id, format_type, quality)
+);
+"""
+
+
+class JobStore:
+    """SQLite journal of queue items and download tasks, and the download archive
+    
+    Every state transition is written through (WAL mode), so unfinished work
+    survives a crash or restart and can be re-queued by resume_jobs().
+    Errors are logged and never interrupt a download.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(JOB_STORE_SCHEMA)
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(tasks)')}
+            for column in ('options', 'files'):
+                if column not in columns:
+                    self._conn.execute(f'ALTER TABLE tasks ADD COLUMN {column} TEXT')
+        return self._conn
+
+    def _write(self, sql, rows):
+        """Run one statement for every row in a single transaction"""
+        with self._lock:
+            try:
+                db = self._db()
+                with db:
+                    db.executemany(sql, rows)
+            except sqlite3.Error as e:
+                log_error(f"Job store write error: {str(e)}")
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            try:
+                return [dict(row) for row in self._db().execute(sql, params)]
+            except sqlite3.Error as e:
+                log_error(f"Job store read error: {str(e)}")
+                return []
+
+    def save_queue_items(self, items, start=0):
+        """Insert or update queue items, storing their queue positions"""
+        self._write(
+            'INSERT OR REPLACE INTO queue_items (id, position, data) VALUES (?, ?, ?)',
+            [(item['id'], start + i, json.dumps(item, ensure_ascii=False)) for i, item in enumerate(items)],
+        )
+
+    def update_queue_item(self, item):
+        self._write(
+            'UPDATE queue_items SET data = ? WHERE id = ?',
+            [(json.dumps(item, ensure_ascii=False), item['id'])],
+        )
+
+    def delete_queue_item(self, item_id):
+        self._write('DELETE FROM queue_items WHERE id = ?', [(item_id,)])
+
+    def load_queue(self):
+        rows = self._read('SELECT data FROM queue_items ORDER BY position')
+        return [json.loads(row['data']) for row in rows]
+
+    def add_tasks(self, tasks):
+        """Record new tasks (dicts with the tasks table columns)"""
+        now = time.time()
+        self._write(
+            'INSERT OR REPLACE INTO tasks (task_id, parent_id, url, output_folder, format_type, quality, '
+            'normalize, priority, title, status, updated_at, options, files) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (t['task_id'], t.get('parent_id'), t['url'], t['output_folder'], t['format_type'],
+                 str(t['quality']), int(bool(t['normalize'])), t.get('priority', 0), t.get('title'),
+                 t.get('status', 'queued'), now, json.dumps(t['options']) if t.get('options') else None,
+                 json.dumps(t['files'], ensure_ascii=False) if t.get('files') else None)
+                for t in tasks
+            ],
+        )
+
+    def update_task(self, task_id, status, files=None):
+        """Record a task's status, and the files it produced once finished"""
+        if files is None:
+            self._write('UPDATE tasks SET status = ?, updated_at = ? WHERE task_id = ?',
+                        [(status, time.time(), task_id)])
+        else:
+            self._write('UPDATE tasks SET status = ?, updated_at = ?, files = ? WHERE task_id = ?',
+                        [(status, time.time(), json.dumps(files, ensure_ascii=False), task_id)])
+
+    def load_unfinished_tasks(self):
+        placeholders = ', '.join('?' * len(FINISHED_STATUSES))
+        return self._read(
+            f'SELECT * FROM tasks WHERE status NOT IN ({placeholders}) ORDER BY rowid',
+            FINISHED_STATUSES,
+        )
+
+    def load_children(self, parent_id):
+        return self._read('SELECT * FROM tasks WHERE parent_id = ? ORDER BY rowid', (parent_id,))
+
+    def prune(self, max_age):
+        """Forget finished tasks older than max_age seconds"""
+        placeholders = ', '.join('?' * len(FINISHED_STATUSES))
+        self._write(
+            f'DELETE FROM tasks WHERE status IN ({placeholders}) AND updated_at < ?',
+            [(*FINISHED_STATUSES, time.time() - max_age)],
+        )
+
+    def archive_add(self, entries):
+        """Record downloaded files (dicts with the archive table columns)"""
+        now = time.time()
+        self._write(
+            'INSERT OR REPLACE INTO archive (extractor, video_id, format_type, quality, title, path, url, added_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (e['extractor'], e['video_id'], e['format_type'], e['quality'], e.get('title'), e['path'],
+                 e.get('url'), now)
+                for e in entries
+            ],
+        )
+
+    def archive_get(self, extractor, video_id, format_type, quality):
+        rows = self._read(
+            'SELECT * FROM archive WHERE extractor = ? AND video_id = ? AND format_type = ? AND quality = ?',
+            (extractor, video_id, format_type, quality),
+        )
+        return rows[0] if rows else None
+
+    def archive_query(self, extractor=None, video_id=None, search=None, limit=50, offset=0):
+        """Return (entries, total) matching the given filters, newest first"""
+        clauses, params = [], []
+        if extractor:
+            clauses.append('extractor = ? COLLATE NOCASE')
+            params.append(extractor)
+        if video_id:
+            clauses.append('video_id = ?')
+            params.append(video_id)
+        if search:
+            clauses.append('title LIKE ?')
+            params.append(f'%{search}%')
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        total = self._read(f'SELECT COUNT(*) AS n FROM archive {where}', params)
+        rows = self._read(f'SELECT * FROM archive {where} ORDER BY added_at DESC LIMIT ? OFFSET ?',
+                          (*params, limit, offset))
+        return rows, total[0]['n'] if total else 0
+
+    def archive_find(self, format_type, quality, video_ids=(), urls=()):
+        """Get archive entries in a format matching any of the video ids or source URLs"""
+        found = []
+        for column, values in (('video_id', list(video_ids)), ('url', list(urls))):
+            for start in range(0, len(values), 500):
+                chunk = values[start:start + 500]
+                found += self._read(
+                    f"SELECT * FROM archive WHERE format_type = ? AND quality = ? "
+                    f"AND {column} IN ({', '.join('?' * len(chunk))})",
+                    (format_type, quality, *chunk),
+                )
+        return found
+
+    def archive_paths(self):
+        return self._read('SELECT extractor, video_id, format_type, quality, path FROM archive')
+
+    def archive_delete(self, keys):
+        """Remove archive entries by (extractor, video_id, format_type, quality)"""
+        self._write(
+            'DELETE FROM archive WHERE extractor = ? AND video_id = ? AND format_type = ? AND quality = ?',
+            keys,
+        )
+
+
+job_store = JobStore(JOBS_DB_FILE)
+
+
+def archive_quality(format_type, quality):
+    """Get the quality an archive entry is keyed by (the codec for audio)"""
+    if format_type == 'audio':
+        return quality if quality in AUDIO_CODEC_ARGS else 'mp3'
+    return str(quality)
+
+
+def find_archived(extractor, video_id, format_type, quality):
+    """Get the archive entry for a download, dropping it if its file is gone"""
+    entry = job_store.archive_get(extractor, video_id, format_type, quality)
+    if entry is not None and not os.path.exists(entry['path']):
+        job_store.archive_delete([(extractor, video_id, format_type, quality)])
+        return None
+    return entry
+
+
+def archived_file_info(entry):
+    """Describe an archived file like a freshly downloaded one"""
+    return {
+        'title': entry['title'] or entry['video_id'],
+        'path': entry['path'],
+        'duration': 0,
+        'size': os.path.getsize(entry['path']) if os.path.exists(entry['path']) else 0,
+        'archived': True,
+    }
+
+
+def task_record(task_id, url, output_folder, format_type, quality, normalize_volume,
+                priority=0, parent_id=None, title=None, options=None):
+    """Build a job store row for a download task"""
+    return {
+        'task_id': task_id,
+        'parent_id': parent_id,
+        'url': url,
+        'output_folder': output_folder,
+        'format_type': format_type,
+        'quality': quality,
+        'normalize': normalize_volume,
+        'priority': priority,
+        'title': title,
+        'options': options or None,  # connection_mode / connections overrides
+    }
+
+
+def submit_download(task):
+    """Hand a download task (a task_record dict or job store row) to the scheduler"""
+    options = task.get('options')
+    if isinstance(options, str):
+        options = json.loads(options)
+    scheduler.submit(
+        task['task_id'],
+        download_media,
+        task['task_id'],
+        task['url'],
+        task['output_folder'],
+        task['format_type'],
+        task['quality'],
+        bool(task['normalize']),
+        task.get('parent_id'),
+        options,
+        priority=task.get('priority', 0),
+        platform=detect_url_type(task['url'])['platform'],
+        on_start=lambda tid: update_queue_item_status(tid, 'downloading'),
+    )
+
+
+def resume_jobs():
+    """Restore the queue and re-queue downloads left unfinished by the last run
+    
+    Completed tasks are not touched; interrupted ones restart from their
+    partial files (yt-dlp 'continuedl').
+    """
+    job_store.prune(JOB_RETENTION)
+    items = job_store.load_queue()
+    resumed = set()
+    
+    for task in job_store.load_unfinished_tasks():
+        if task['parent_id']:
+            continue  # Re-queued together with its playlist task
+        
+        task_id = task['task_id']
+        cancel_flags[task_id] = False
+        children = job_store.load_children(task_id)
+        resumed.add(task_id)
+        
+        if not children:
+            submit_download(task)
+            continue
+        
+        # Fanned-out playlist: rebuild parent/children, re-queue unfinished entries
+        active_downloads[task_id] = {
+            'status': 'downloading',
+            'percent': 0,
+            'files': [],
+            'errors': [],
+            'completed': 0,
+            'total': len(children),
+            'format_type': task['format_type'],
+            'current_title': task['title'] or 'Playlist',
+            'children': [child['task_id'] for child in children],
+            'parent': None,
+        }
+        pending = []
+        for child in children:
+            finished = child['status'] in FINISHED_STATUSES
+            cancel_flags[child['task_id']] = False
+            active_downloads[child['task_id']] = {
+                'status': child['status'] if finished else 'pending',
+                'percent': 100 if finished else 0,
+                'files': json.loads(child['files']) if finished and child.get('files') else [],
+                'errors': [],
+                'completed': 1 if finished else 0,
+                'total': 1,
+                'format_type': child['format_type'],
+                'current_title': child['title'] or child['url'],
+                'url': child['url'],
+                'parent': task_id,
+            }
+            if not finished:
+                pending.append(child)
+        
+        with task_lock:
+            rollup_playlist_task(task_id)
+        for child in pending:
+            submit_download(child)
+        if not pending:
+            child_task_finished(task_id)
+    
+    with queue_lock:
+        download_queue[:] = items
+        for item in download_queue:
+            if item['status'] in ('queued', 'downloading'):
+                item['status'] = 'queued' if item.get('task_id') in resumed else 'pending'
+        job_store.save_queue_items(download_queue)
+    
+    return len(resumed)
+
+
+# ============== BULK IMPORT ==============
+
+def new_queue_item(url, title=None, thumbnail='', format_type='audio', quality='mp3', normalize=False,
+                   priority=0, options=None):
+    """Build a pending queue item"""
+    return {
+        'id': str(uuid.uuid4()),
+        'url': url,
+        'title': title or 'Unknown',
+        'thumbnail': thumbnail or '',
+        'format': format_type,
+        'quality': quality,
+        'normalize': normalize,
+        'priority': priority,
+        'status': 'pending',
+        'added_at': datetime.now().isoformat(),
+        **(options or {}),
+    }
+
+
+def media_identity(url, url_info=None):
+    """Get a cheap dedup key for a URL: the video id for YouTube, else the URL"""
+    url_info = url_info or detect_url_type(url)
+    if url_info['platform'] == 'youtube' and url_info['type'] in ('video', 'short', 'live'):
+        return ('youtube', url_info['id'])
+    return ('url', url.split('#', 1)[0].rstrip('/'))
+
+
+def iter_import_rows(stream, kind):
+    """Yield (url, title) pairs from an uploaded text, CSV or JSON file
+    
+    Text and CSV are read line by line. JSON may be a list of URLs, a list of
+    objects with a 'url' (and optional 'title'), or {'urls': [...]}; other
+    entries come out as (None, None) so they are counted as invalid rows.
+    """
+    if kind == 'json':
+        data = json.load(stream)
+        if isinstance(data, dict):
+            data = data.get('urls') or data.get('entries') or data.get('items') or []
+        if not isinstance(data, list):
+            raise ValueError('expected a list of URLs or an object with a "urls" list')
+        for entry in data:
+            if isinstance(entry, str):
+                yield entry, None
+            elif isinstance(entry, dict):
+                url = entry.get('url') or entry.get('webpage_url')
+                title = entry.get('title')
+                yield (url if isinstance(url, str) else None), (title if isinstance(title, str) else None)
+            else:
+                yield None, None
+        return
+    
+    if kind == 'csv':
+        url_column, title_column = None, None
+        for row in csv.reader(stream):
+            if not row:
+                continue
+            lowered = [cell.strip().lower() for cell in row]
+            if url_column is None and 'url' in lowered:
+                url_column = lowered.index('url')
+                title_column = lowered.index('title') if 'title' in lowered else None
+                continue  # header
+            if url_column is not None and url_column < len(row):
+                title = row[title_column] if title_column is not None and title_column < len(row) else None
+                yield row[url_column], title
+            else:
+                # No header: the first cell that looks like a URL
+                yield next((cell for cell in row if '.' in cell and ' ' not in cell.strip()), row[0]), None
+        return
+    
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line.split()[0], None
+
+
+def import_kind(filename, content_type):
+    """Guess the import format from a file name or content type"""
+    name = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith('.json') or 'json' in content_type:
+        return 'json'
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    return 'text'
+
+
+# ============== PROFILING ==============
+
+PROFILE_ID_PATTERN = re.compile(r'[\w-]+')
+
+
+class ProfileStore:
+    """Ring buffer of per-task profiles on disk
+    
+    Each profile is a pstats dump (<id>.prof) next to a JSON summary
+    (<id>.json) with the hottest functions and the allocation sites that grew
+    most; only the newest `keep` profiles are kept. tracemalloc is process-wide,
+    so it runs while at least one profiled task does and its figures include
+    allocations made by other threads meanwhile. Only one task at a time runs
+    under cProfile (Python 3.12+ refuses a second active profiler); tasks
+    profiled meanwhile only get the timings and allocations.
+    """
+
+    def __init__(self, directory, keep):
+        self.directory = Path(directory)
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()  # held by the task running under cProfile
+        self._tracing = 0  # profiled tasks currently running
+
+    def _start_tracing(self):
+        with self._lock:
+            self._tracing += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            return tracemalloc.take_snapshot()
+
+    def _stop_tracing(self):
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            self._tracing -= 1
+            if self._tracing == 0:
+                tracemalloc.stop()
+            return snapshot, peak
+
+    def run(self, task_id, url, fn, *args):
+        """Run fn(*args) under cProfile and tracemalloc, then store the profile"""
+        before = self._start_tracing()
+        profiler = None
+        if self._profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # Another profiling tool (debugger, coverage) is active
+                profiler = None
+                self._profiling.release()
+        if profiler is None:
+            log_error(f"Task {task_id} is profiled without cProfile: another profiler is active")
+        started = datetime.now()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            return fn(*args)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.release()
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            after, peak = self._stop_tracing()
+            try:
+                self._save(task_id, url, profiler, before, after, {
+                    'started': started.isoformat(timespec='seconds'),
+                    'wall_seconds': round(wall, 3),
+                    'cpu_seconds': round(cpu, 3),
+                    'peak_traced_bytes': peak,
+                })
+            except Exception as e:
+                log_error(f"Could not save profile of task {task_id}: {str(e)}")
+
+    def _save(self, task_id, url, profiler, before, after, summary):
+        stats = pstats.Stats(profiler) if profiler is not None else None
+        hottest = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP] if stats else []
+        # Leave out the profilers' own bookkeeping (of this and concurrently profiled tasks)
+        ignored = [tracemalloc.Filter(False, module.__file__) for module in (tracemalloc, cProfile, pstats)]
+        ignored.append(tracemalloc.Filter(False, '<frozen importlib._bootstrap*'))
+        grown = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), 'lineno')[:PROFILE_TOP]
+        state = active_downloads.get(task_id) or {}
+        summary.update({
+            'task_id': task_id,
+            'url': url,
+            'platform': state.get('platform', 'unknown'),
+            'status': state.get('status'),
+            'cprofile': stats is not None,
+            'functions': [
+                {
+                    'function': f'{name} ({os.path.basename(filename)}:{line})',
+                    'calls': calls,
+                    'total_seconds': round(total, 6),
+                    'cumulative_seconds': round(cumulative, 6),
+                }
+                for (filename, line, name), (_, calls, total, cumulative, _) in hottest
+            ],
+            'allocations': [
+                {
+                    'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                    'size_diff': stat.size_diff,
+                    'count_diff': stat.count_diff,
+                    'size': stat.size,
+                }
+                for stat in grown
+            ],
+        })
+        # Full task id: playlist children share their parent's prefix and often its start second
+        profile_id = f"{summary['started'].replace(':', '').replace('T', '-')}-{task_id}"
+        summary['id'] = profile_id
+        
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if stats is not None:
+                stats.dump_stats(str(self.directory / f'{profile_id}.prof'))
+            with open(self.directory / f'{profile_id}.json', 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            for old in self._ids()[:-self.keep]:
+                for suffix in ('.json', '.prof'):
+                    (self.directory / f'{old}{suffix}').unlink(missing_ok=True)
+
+    def _ids(self):
+        """Stored profile ids, oldest first"""
+        if not self.directory.exists():
+            return []
+        return sorted(p.stem for p in self.directory.glob('*.json'))
+
+    def list(self):
+        """Summaries of the stored profiles (without the function/allocation tables), newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            summary = self.get(profile_id)
+            if summary is not None:
+                summary.pop('functions', None)
+                summary.pop('allocations', None)
+                profiles.append(summary)
+        return profiles
+
+    def get(self, profile_id):
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        try:
+            with open(self.directory / f'{profile_id}.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def pstats_path(self, profile_id):
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        path = self.directory / f'{profile_id}.prof'
+        return path if path.exists() else None
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_KEEP)
+
+
+# ============== POST-DOWNLOAD PIPELINE ==============
+# fetch (scheduler workers) -> transcode (ffmpeg) -> tag (ID3) -> record (history)
+
+AUDIO_CODEC_ARGS = {
+    'mp3': ['-c:a', 'libmp3lame', '-q:a', '0'],
+    'm4a': ['-c:a', 'aac', '-b:a', '256k'],
+    'flac': ['-c:a', 'flac'],
+    'wav': ['-c:a', 'pcm_s16le'],
+}
+LOUDNORM_FILTER = 'loudnorm=I=-16:TP=-1.5:LRA=11'
+
+
+def get_ffmpeg_executable():
+    """Get the ffmpeg executable to run"""
+    bin_path = get_ffmpeg_path()
+    if bin_path:
+        return os.path.join(bin_path, 'ffmpeg.exe')
+    return shutil.which('ffmpeg') or 'ffmpeg'
+
+
+def run_ffmpeg(args):
+    """Run ffmpeg with the given arguments, raising on failure"""
+    cmd = [get_ffmpeg_executable(), '-hide_banner', '-loglevel', 'error', '-y'] + args
+    proc = subprocess.run(
+        cmd,
+        capture_output=True,
+        creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+    )
+    if proc.returncode != 0:
+        message = proc.stderr.decode('utf-8', errors='replace').strip()
+        raise Exception(f"FFmpeg failed: {message[-300:]}")
+
+
+def transcode_stage(job):
+    """Convert the downloaded file to its final format"""
+    if is_cancelled(job['task_id']):
+        raise Exception("Download cancelled by user")
+    
+    source = job['path']
+    base = os.path.splitext(source)[0]
+    
+    if job['format_type'] == 'audio':
+        target = f"{base}.{job['codec']}"
+        if source == target and not job['normalize']:
+            return
+        output = f"{base}.part.{job['codec']}" if source == target else target
+        args = ['-i', source, '-vn']
+        if job['normalize']:
+            args += ['-af', LOUDNORM_FILTER]
+        args += AUDIO_CODEC_ARGS[job['codec']] + [output]
+    else:
+        # Merged downloads are already mp4; single-file ones just get remuxed
+        target = output = f"{base}.mp4"
+        if source == target:
+            return
+        args = ['-i', source, '-c', 'copy', output]
+    
+    run_ffmpeg(args)
+    if output != target:
+        os.replace(output, target)
+    elif os.path.exists(source):
+        os.remove(source)
+    job['path'] = target
+
+
+def tag_stage(job):
+    """Write ID3 tags to MP3 files"""
+    if job['path'].endswith('.mp3'):
+        add_id3_tags(job['path'], job['title'], job['uploader'], job['thumbnail'])
+
+
+def record_stage(job):
+    """Register the finished file on its task and in the history"""
+    path = job['path']
+    size = os.path.getsize(path)
+    file_info = {
+        'title': job['title'],
+        'path': path,
+        'duration': job['duration'],
+        'size': size,
+    }
+    history_entry = {
+        'title': job['title'],
+        'path': path,
+        'duration': format_duration(job['duration']),
+        'date': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'type': job['format_type'],
+        'size': format_size(size),
+    }
+    add_history_entry(history_entry)
+    if job.get('extractor') and job.get('video_id'):
+        job_store.archive_add([{
+            'extractor': job['extractor'],
+            'video_id': job['video_id'],
+            'format_type': job['format_type'],
+            'quality': job['archive_quality'],
+            'title': job['title'],
+            'path': path,
+            'url': job.get('url'),
+        }])
+    
+    active_downloads[job['task_id']]['files'].append(file_info)
+    pipeline_job_done(job)
+
+
+def pipeline_job_done(job, error=None):
+    """Account for one pipeline job; finishes the task after its last job"""
+    state = active_downloads[job['task_id']]
+    with task_lock:
+        if error is not None:
+            state['errors'].append({'title': job['title'], 'error': str(error)})
+            log_error(f"Pipeline error for {job['title']}: {str(error)}")
+        state['completed'] += 1
+        state['pipeline_pending'] -= 1
+        done = state['pipeline_pending'] == 0
+    
+    if done:
+        finish_download_task(job['task_id'], job['parent_id'])
+
+
+def finish_download_task(task_id, parent_id=None):
+    """Set the final status of a download task once all its files are done"""
+    state = active_downloads[task_id]
+    if is_cancelled(task_id):
+        status = 'cancelled'
+    elif state['errors'] and not state['files']:
+        status = 'error'
+        state['error'] = state['errors'][0]['error']
+    else:
+        status = 'completed'
+    state['status'] = status
+    update_queue_item_status(task_id, status)
+    
+    # Playlist entries are notified once, by their parent
+    if parent_id:
+        child_task_finished(parent_id)
+    elif status == 'completed':
+        send_notification(
+            "Téléchargement terminé ✓",
+            f"{len(state['files'])} fichier(s) téléchargé(s)"
+        )
 
 
-# Keep old function name for compatibility
-def search_youtube(query, max_results=50):
-    return search_media(query, 'youtube', max_results)
+record_pool = PipelineStage('record', record_stage, 1, STAGE_BACKLOG, on_error=pipeline_job_done)
+tag_pool = PipelineStage('tag', tag_stage, TAG_WORKERS, TAG_WORKERS * STAGE_BACKLOG,
+                         next_stage=record_pool, on_error=pipeline_job_done)
+transcode_pool = PipelineStage('transcode', transcode_stage, TRANSCODE_WORKERS, TRANSCODE_WORKERS * STAGE_BACKLOG,
+                               next_stage=tag_pool, on_error=pipeline_job_done)
 
 
 def update_queue_item_status(task_id, status):
-    """Update the status of a queue item by its task_id"""
+    """Update the status of a queue item (and its journaled task) by task_id"""
+    state = active_downloads.get(task_id) or {}
+    # Playlist entries keep their files so a resumed playlist reports them
+    files = state.get('files') if status in FINISHED_STATUSES and state.get('parent') else None
+    job_store.update_task(task_id, status, files)
+    if status in FINISHED_STATUSES:
+        metrics.inc('ytextractor_tasks_total', status=status, platform=state.get('platform', 'unknown'))
+    publish_task(task_id)
     with queue_lock:
         for item in download_queue:
             if item.get('task_id') == task_id:
                 item['status'] = status
+                job_store.update_queue_item(item)
+                queue_item_changed(item['id'], {'status': status, 'task_id': task_id})
                 break
+    if status in FINISHED_STATUSES:
+        active_downloads.finished(task_id)
 
 
-def download_media(task_id, url, output_folder, format_type='audio', quality='best', normalize_volume=False):
-    """Download media from YouTube URL"""
-    global active_downloads, download_history
-    
+def publish_task(task_id):
+    """Push a task's current state to /api/events clients"""
+    state = active_downloads.get(task_id)
+    if state is None:
+        return
+    fields = {k: v for k, v in state.items() if k not in EVENT_EXCLUDED_FIELDS}
+    fields['file_count'] = len(state.get('files', []))
+    fields['error_count'] = len(state.get('errors', []))
+    task_changes.touch(task_id)
+    event_broker.publish('task', task_id, fields)
+
+
+def queue_item_changed(item_id, fields):
+    """Record a change to a queue item for ?since= queries and /api/events"""
+    queue_changes.touch(item_id)
+    event_broker.publish('queue', item_id, fields)
+
+
+def publish_parent_progress(parent_id):
+    """Push a playlist task's aggregate progress, at most EVENTS_RATE times a second"""
+    now = time.monotonic()
+    if now - parent_publish_times.get(parent_id, 0) < 1.0 / EVENTS_RATE:
+        return
+    parent_publish_times[parent_id] = now
+    with task_lock:
+        rollup_playlist_task(parent_id)
+    publish_task(parent_id)
+
+
+def is_cancelled(task_id):
+    """Check whether a task, or the playlist task it belongs to, was cancelled"""
     if cancel_flags.get(task_id):
-        active_downloads[task_id]['status'] = 'cancelled'
+        return True
+    parent_id = active_downloads.get(task_id, {}).get('parent')
+    return bool(parent_id and cancel_flags.get(parent_id))
+
+
+def flatten_entries(entries):
+    """Yield the media entries of a processed playlist, descending into nested playlists"""
+    for entry in entries or []:
+        if not entry:
+            continue
+        if entry.get('entries') is not None:
+            yield from flatten_entries(entry['entries'])
+        else:
+            yield entry
+
+
+def fan_out_playlist(task_id, info, output_folder, format_type, quality, normalize_volume, options=None):
+    """Split a playlist task into one child task per entry on the worker pool
+    
+    Returns False (and schedules nothing) if some entry has no URL it can be
+    downloaded from on its own. Entries already in the download archive are
+    completed right away instead of being scheduled.
+    """
+    options = options or {}
+    entries = []
+    for entry in info['entries']:
+        entry_url = entry.get('webpage_url')
+        if not entry_url and entry.get('_type') in ('url', 'url_transparent'):
+            entry_url = entry.get('url')
+        if not entry_url:
+            return False
+        entries.append((entry_url, entry.get('title') or entry_url, entry))
+    
+    quality_key = archive_quality(format_type, quality)
+    priority = scheduler.job_priority(task_id)
+    children = []
+    records = []
+    for index, (entry_url, title, entry) in enumerate(entries):
+        child_id = f"{task_id}-{index + 1}"
+        extractor = entry.get('ie_key') or entry.get('extractor_key')
+        archived = None
+        if not options.get('redownload') and extractor and entry.get('id'):
+            archived = find_archived(extractor, entry['id'], format_type, quality_key)
+        cancel_flags[child_id] = False
+        active_downloads[child_id] = {
+            'status': 'pending' if archived is None else 'completed',
+            'percent': 0 if archived is None else 100,
+            'files': [] if archived is None else [archived_file_info(archived)],
+            'errors': [],
+            'completed': 0 if archived is None else 1,
+            'total': 1,
+            'format_type': format_type,
+            'current_title': title,
+            'url': entry_url,
+            'parent': task_id,
+        }
+        if archived is not None:
+            active_downloads[child_id]['skipped'] = 'archived'
+        children.append(child_id)
+        record = task_record(child_id, entry_url, output_folder, format_type, quality,
+                             normalize_volume, priority, task_id, title, options)
+        if archived is not None:
+            record['status'] = 'completed'
+            record['files'] = active_downloads[child_id]['files']
+        records.append(record)
+    
+    active_downloads[task_id].update({
+        'status': 'downloading',
+        'children': children,
+        'total': len(children),
+        'completed': 0,
+        'current_title': info.get('title', 'Playlist'),
+    })
+    publish_task(task_id)
+    
+    # Children inherit the playlist's priority and go through the scheduler
+    # like any other job, so platform limits apply per entry
+    job_store.add_tasks(records)
+    pending = [record for record in records if record.get('status') != 'completed']
+    for record in pending:
+        submit_download(record)
+    if not pending:
+        child_task_finished(task_id)
+    return True
+
+
+def rollup_playlist_task(task_id, parent=None):
+    """Aggregate child task states into their playlist task (caller holds task_lock)"""
+    if parent is None:
+        parent = active_downloads[task_id]
+    children = [c for c in (active_downloads.get(child_id) for child_id in parent['children']) if c is not None]
+    
+    finished = [c for c in children if c['status'] in FINISHED_STATUSES]
+    running = [c for c in children if c['status'] in ('downloading', 'processing')]
+    
+    parent['completed'] = len(finished)
+    parent['files'] = [f for c in children for f in c['files']]
+    parent['errors'] = [
+        {'title': c.get('current_title', 'Unknown'), 'error': c.get('error', '')}
+        for c in children if c['status'] == 'error'
+    ]
+    if children:
+        progress = sum(100 if c['status'] in FINISHED_STATUSES else c.get('percent', 0) for c in children)
+        parent['percent'] = round(progress / len(children), 1)
+    if running:
+        parent['current_title'] = running[0].get('current_title', 'Unknown')
+        parent['speed'] = running[0].get('speed', '')
+    return parent, children, finished
+
+
+def child_task_finished(parent_id):
+    """Update a playlist task after one of its children finished"""
+    with task_lock:
+        parent, children, finished = rollup_playlist_task(parent_id)
+        pending = len(finished) < len(children)
+        if pending or parent['status'] in FINISHED_STATUSES:
+            parent = None
+        elif cancel_flags.get(parent_id):
+            status = 'cancelled'
+        elif children and all(c['status'] == 'error' for c in children):
+            status = 'error'
+            parent['error'] = children[0].get('error', 'Download failed')
+        else:
+            status = 'completed'
+        if parent is not None:
+            parent['status'] = status
+    
+    if parent is None:
+        if pending:
+            publish_parent_progress(parent_id)
+        return
+    update_queue_item_status(parent_id, status)
+    if status == 'completed':
+        send_notification(
+            "Téléchargement terminé ✓",
+            f"{len(parent['files'])} fichier(s) téléchargé(s)"
+        )
+
+
+def cancel_task(task_id):
+    """Request cancellation of a task and its playlist children
+    
+    Jobs that haven't started yet are removed from the scheduler right away;
+    running ones stop at their next progress callback.
+    """
+    cancel_flags[task_id] = True
+    children = active_downloads.get(task_id, {}).get('children', [])
+    
+    for tid in [task_id] + children:
+        if scheduler.cancel(tid):
+            state = active_downloads.setdefault(tid, {'files': [], 'errors': [], 'percent': 0})
+            state['status'] = 'cancelled'
+            update_queue_item_status(tid, 'cancelled')
+    
+    if children:
+        child_task_finished(task_id)
+
+
+def get_task_progress(task_id):
+    """Get a task's progress, None if unknown or evicted; playlist tasks include per-child state"""
+    task = active_downloads.get(task_id)
+    if task is None:
+        return None
+    if 'children' not in task:
+        return dict(task.items())
+    
+    with task_lock:
+        parent, _, _ = rollup_playlist_task(task_id, task)
+        progress = dict(parent.items())
+        progress['children'] = [
+            {
+                'task_id': child_id,
+                'status': child['status'],
+                'percent': child.get('percent', 0),
+                'title': child.get('current_title', 'Unknown'),
+                'error': child.get('error'),
+            }
+            for child_id, child in ((c, active_downloads.get(c)) for c in parent['children'])
+            if child is not None
+        ]
+    return progress
+
+
+def download_media(task_id, url, output_folder, format_type='audio', quality='best', normalize_volume=False,
+                   parent_id=None, options=None):
+    """Download media from YouTube URL (parent_id is set for playlist entry tasks)"""
+    handed_off = False
+    args = (task_id, url, output_folder, format_type, quality, normalize_volume, parent_id, options or {})
+    try:
+        if options and options.get('profile'):
+            handed_off = profile_store.run(task_id, url, _download_media, *args)
+        else:
+            handed_off = _download_media(*args)
+    finally:
+        # Tasks handed to the pipeline are finished by its last stage
+        if parent_id and not handed_off:
+            child_task_finished(parent_id)
+
+
+def _download_media(task_id, url, output_folder, format_type, quality, normalize_volume, parent_id, options):
+    """Fetch stage: download the bytes, then hand each file to the pipeline
+    
+    Returns True if the task's completion was left to the pipeline.
+    """
+    global active_downloads
+    
+    if is_cancelled(task_id):
+        active_downloads.setdefault(task_id, {'files': [], 'errors': [], 'percent': 0})['status'] = 'cancelled'
         update_queue_item_status(task_id, 'cancelled')
         return
     
     os.makedirs(output_folder, exist_ok=True)
+    platform = host_platform(url_host(url))
+    
+    # Already downloaded in this format: done before any network work
+    use_archive = not options.get('redownload')
+    quality_key = archive_quality(format_type, quality)
+    archive_key = media_cache_key(url) if use_archive else None
+    archived = find_archived(*archive_key, format_type, quality_key) if archive_key else None
+    if archived is not None:
+        active_downloads[task_id] = {
+            'status': 'completed',
+            'percent': 100,
+            'files': [archived_file_info(archived)],
+            'errors': [],
+            'completed': 1,
+            'total': 1,
+            'format_type': format_type,
+            'current_title': archived['title'],
+            'parent': parent_id,
+            'platform': platform,
+            'skipped': 'archived',
+        }
+        finish_download_task(task_id, parent_id)
+        return True
+    
+    # Playlist entries (and URLs without an id known up front) are checked
+    # by yt-dlp's match_filter before they are extracted or downloaded
+    archived_entries = {}  # video id -> archive entry skipped by the filter
+    
+    def archive_filter(info, incomplete=False):
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        video_id = info.get('id')
+        if not use_archive or not extractor or not video_id:
+            return None
+        entry = find_archived(extractor, video_id, format_type, quality_key)
+        if entry is None:
+            return None
+        archived_entries[video_id] = entry
+        return f"{video_id} is already in the download archive"
+    
+    # Cover art is fetched while the audio downloads so tagging doesn't wait
+    codec = quality if quality in AUDIO_CODEC_ARGS else 'mp3'
+    prefetch_cover = MUTAGEN_AVAILABLE and format_type == 'audio' and codec == 'mp3'
+    prefetched = set()
+    file_bytes = {}  # filename -> bytes already charged to the bandwidth governor
+    
+    def throttle(nbytes):
+        """Sleep off this task's bandwidth debt, staying responsive to cancel"""
+        wait = bandwidth_governor.consume(task_id, nbytes)
+        while wait > 0:
+            if is_cancelled(task_id):
+                raise Exception("Download cancelled by user")
+            time.sleep(min(wait, 0.25))
+            wait -= 0.25
     
     def progress_hook(d):
-        if cancel_flags.get(task_id):
+        if is_cancelled(task_id):
             raise Exception("Download cancelled by user")
         
         if d['status'] == 'downloading':
@@ -500,35 +3572,36 @@ def download_media(task_id, url, output_folder, format_type='audio', quality='be
                 'current_title': d.get('info_dict', {}).get('title', 'Unknown'),
             })
             
+            # The first report of a file may include resumed bytes: don't charge them
+            filename = d.get('filename')
+            if filename in file_bytes and downloaded > file_bytes[filename]:
+                throttle(downloaded - file_bytes[filename])
+            file_bytes[filename] = downloaded
+            limit = bandwidth_governor.task_limit(task_id)
+            headroom = bandwidth_governor.headroom()
+            active_downloads[task_id]['bandwidth_limit'] = format_size(limit) + '/s' if limit else ''
+            active_downloads[task_id]['bandwidth_headroom'] = format_size(headroom) + '/s' if headroom is not None else ''
+            
+            thumbnail = d.get('info_dict', {}).get('thumbnail')
+            if prefetch_cover and thumbnail and thumbnail not in prefetched:
+                prefetched.add(thumbnail)
+                thumbnail_cache.prefetch(thumbnail)
+            
         elif d['status'] == 'finished':
             active_downloads[task_id]['status'] = 'processing'
             active_downloads[task_id]['percent'] = 100
+        
+        publish_task(task_id)
+        if parent_id:
+            publish_parent_progress(parent_id)
     
     # Configure yt-dlp options
+    # Audio conversion and normalization run in the transcode stage, not here
     if format_type == 'audio':
-        postprocessors = [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': quality if quality in ['mp3', 'm4a', 'flac', 'wav'] else 'mp3',
-            'preferredquality': '0',
-        }]
-        
-        # Add volume normalization if requested
-        if normalize_volume:
-            postprocessors.append({
-                'key': 'FFmpegMetadata',
-            })
-        
         ydl_opts = {
             'format': 'bestaudio/best',
-            'postprocessors': postprocessors,
             'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
         }
-        
-        # Add FFmpeg postprocessor args for volume normalization
-        if normalize_volume:
-            ydl_opts['postprocessor_args'] = {
-                'ffmpeg': ['-af', 'loudnorm=I=-16:TP=-1.5:LRA=11']
-            }
     else:
         # Video download
         format_str = f'bestvideo[height<={quality}]+bestaudio/best[height<={quality}]' if quality != 'best' else 'bestvideo+bestaudio/best'
@@ -546,8 +3619,16 @@ def download_media(task_id, url, output_folder, format_type='audio', quality='be
     # Add platform-specific options (User-Agent, Instagram support, etc.)
     ydl_opts.update(get_platform_ydl_opts(url))
     
+    # Connections wanted by this task; the budget decides how many it gets
+    connection_mode = options.get('connection_mode', 'fragments')
+    if connection_mode == 'native':
+        wanted_connections = 1
+    else:
+        wanted_connections = options.get('connections') or ydl_opts['concurrent_fragment_downloads']
+    
     ydl_opts.update({
         'progress_hooks': [progress_hook],
+        'match_filter': archive_filter,
         'quiet': True,
         'no_warnings': True,
         'ignoreerrors': True,
@@ -559,15 +3640,9 @@ def download_media(task_id, url, output_folder, format_type='audio', quality='be
         'http_chunk_size': 10485760,  # 10MB chunks
     })
     
-    # Try to load Chrome cookies (helps with restricted content)
-    # Falls back gracefully if Chrome is open/locked
-    try:
-        test_opts = {**ydl_opts, 'cookiesfrombrowser': ('chrome',)}
-        with yt_dlp.YoutubeDL(test_opts) as test_ydl:
-            test_ydl.cookiejar  # Force cookie loading to test access
-        ydl_opts['cookiesfrombrowser'] = ('chrome',)
-    except Exception:
-        log_error("Could not load Chrome cookies (browser may be open). Continuing without cookies.")
+    # Shared Chrome cookies (helps with restricted content)
+    # None if Chrome is open/locked - downloads continue without cookies
+    cookiejar = get_shared_cookiejar()
     
     active_downloads[task_id] = {
         'status': 'starting',
@@ -577,28 +3652,38 @@ def download_media(task_id, url, output_folder, format_type='audio', quality='be
         'completed': 0,
         'total': 1,
         'format_type': format_type,
+        'parent': parent_id,
+        'platform': platform,
+        'url': url,
+        'connection_mode': connection_mode,
     }
     
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            if cookiejar is not None:
+                ydl.cookiejar = cookiejar
+            
             # Check for cancellation before starting download
-            if cancel_flags.get(task_id):
+            if is_cancelled(task_id):
                 active_downloads[task_id]['status'] = 'cancelled'
                 update_queue_item_status(task_id, 'cancelled')
                 return
 
-            # Extract info first with retry logic
+            # Extract info once (unprocessed) with retry logic; the same
+            # result is then processed for download below
             info = None
+            from_cache = False
             extract_retries = 3
             for attempt in range(extract_retries):
                 try:
-                    info = ydl.extract_info(url, download=False)
+                    with metrics.timer('ytextractor_stage_seconds', stage='extract', platform=platform):
+                        info, from_cache = extract_raw_info(ydl, url)
                     if info is not None:
                         break
                 except Exception as extract_err:
                     log_error(f"Extract info attempt {attempt + 1} failed for {url}: {str(extract_err)}")
                     if attempt < extract_retries - 1:
-                        import time
+                        metrics.inc('ytextractor_retries_total', kind='extract', platform=platform)
                         time.sleep(1)  # Brief pause before retry
                     else:
                         raise Exception(f"Failed to extract info after {extract_retries} attempts: {str(extract_err)}")
@@ -607,13 +3692,44 @@ def download_media(task_id, url, output_folder, format_type='audio', quality='be
                 raise Exception("Could not fetch video info (invalid URL or video unavailable)")
 
             if info.get('entries') is not None:
-                entries_list = [e for e in (info.get('entries') or []) if e]
-                total = len(entries_list)
-                active_downloads[task_id]['total'] = total
+                # Materialize lazy playlist pages once so they are not re-fetched
+                info['entries'] = [e for e in (info.get('entries') or []) if e]
+                active_downloads[task_id]['total'] = len(info['entries'])
+                
+                # Spread the entries over the worker pool; the children
+                # report back through child_task_finished. The task tree is
+                # one level deep: an entry that is a playlist itself (a
+                # channel's Videos/Shorts/Live tabs) downloads inline
+                if PLAYLIST_FANOUT and not parent_id and info['entries'] and fan_out_playlist(
+                        task_id, info, output_folder, format_type, quality, normalize_volume, options):
+                    return
             
-            result = ydl.extract_info(url, download=True)
+            if connection_mode == 'external' and bandwidth_governor.limited():
+                # aria2c reports no progress to yt-dlp, so the governor couldn't pace it
+                connection_mode = 'fragments'
+                active_downloads[task_id]['connection_mode'] = connection_mode
+            connections = connection_budget.acquire(wanted_connections, lambda: is_cancelled(task_id))
+            if not connections:
+                raise Exception("Download cancelled by user")
+            ydl.params.update(connection_ydl_opts(connection_mode, connections))
+            active_downloads[task_id]['connections'] = connections
+            bandwidth_governor.register(task_id, options.get('bandwidth_weight', 1))
+            try:
+                with metrics.timer('ytextractor_stage_seconds', stage='transfer', platform=platform):
+                    result = ydl.process_ie_result(info, download=True)
+                if result is None and from_cache and not is_cancelled(task_id):
+                    # Cached stream URLs may have been rejected: retry with fresh info
+                    metrics.inc('ytextractor_retries_total', kind='stale_url', platform=platform)
+                    invalidate_media_info(url)
+                    info, _ = extract_raw_info(ydl, url)
+                    if info is not None:
+                        with metrics.timer('ytextractor_stage_seconds', stage='transfer', platform=platform):
+                            result = ydl.process_ie_result(info, download=True)
+            finally:
+                connection_budget.release(connections)
+                bandwidth_governor.unregister(task_id)
             
-            if cancel_flags.get(task_id):
+            if is_cancelled(task_id):
                 active_downloads[task_id]['status'] = 'cancelled'
                 update_queue_item_status(task_id, 'cancelled')
                 return
@@ -623,63 +3739,52 @@ def download_media(task_id, url, output_folder, format_type='audio', quality='be
                 raise Exception("Download returned no result (content may be unavailable)")
             
             if result.get('entries') is not None:
-                entries = [e for e in (result.get('entries') or []) if e]
+                entries = list(flatten_entries(result['entries']))
             else:
                 entries = [result]
             
+            jobs = []
+            for archived in archived_entries.values():
+                active_downloads[task_id]['files'].append(archived_file_info(archived))
+                active_downloads[task_id]['completed'] += 1
             for entry in entries:
-                if entry:
-                    filename = ydl.prepare_filename(entry)
-                    
-                    if format_type == 'audio':
-                        ext = quality if quality in ['mp3', 'm4a', 'flac', 'wav'] else 'mp3'
-                        final_filename = os.path.splitext(filename)[0] + f'.{ext}'
-                    else:
-                        final_filename = os.path.splitext(filename)[0] + '.mp4'
-                    
-                    if os.path.exists(final_filename):
-                        # Add ID3 tags for audio
-                        if format_type == 'audio' and final_filename.endswith('.mp3'):
-                            add_id3_tags(
-                                final_filename,
-                                entry.get('title', 'Unknown'),
-                                entry.get('uploader', 'Unknown'),
-                                entry.get('thumbnail')
-                            )
-                        
-                        file_info = {
-                            'title': entry.get('title', 'Unknown'),
-                            'path': final_filename,
-                            'duration': entry.get('duration', 0),
-                            'size': os.path.getsize(final_filename),
-                        }
-                        active_downloads[task_id]['files'].append(file_info)
-                        
-                        # Add to history
-                        history_entry = {
-                            'title': entry.get('title', 'Unknown'),
-                            'path': final_filename,
-                            'duration': format_duration(entry.get('duration', 0)),
-                            'date': datetime.now().strftime('%d/%m/%Y %H:%M'),
-                            'type': format_type,
-                            'size': format_size(os.path.getsize(final_filename)),
-                        }
-                        with queue_lock:
-                            download_history.insert(0, history_entry)
-                            download_history[:] = download_history[:100]
-                        save_history()
-                    
+                if entry.get('id') in archived_entries:
+                    continue
+                downloads = entry.get('requested_downloads') or [{}]
+                path = downloads[0].get('filepath') or ydl.prepare_filename(entry)
+                if not os.path.exists(path):
                     active_downloads[task_id]['completed'] += 1
+                    continue
+                jobs.append({
+                    'task_id': task_id,
+                    'parent_id': parent_id,
+                    'path': path,
+                    'format_type': format_type,
+                    'codec': codec,
+                    'normalize': normalize_volume,
+                    'platform': platform,
+                    'title': entry.get('title', 'Unknown'),
+                    'uploader': entry.get('uploader', 'Unknown'),
+                    'thumbnail': entry.get('thumbnail'),
+                    'duration': entry.get('duration', 0),
+                    'extractor': entry.get('extractor_key'),
+                    'video_id': entry.get('id'),
+                    'archive_quality': quality_key,
+                    'url': entry.get('webpage_url') or url,
+                })
         
-        active_downloads[task_id]['status'] = 'completed'
-        update_queue_item_status(task_id, 'completed')
+        if not jobs:
+            finish_download_task(task_id, parent_id)
+            return True
         
-        # Send notification
-        file_count = len(active_downloads[task_id]['files'])
-        send_notification(
-            "Téléchargement terminé ✓",
-            f"{file_count} fichier(s) téléchargé(s)"
-        )
+        # Transcode/tag/record run on their own pools; this worker goes back
+        # to the scheduler as soon as the transcode stage accepts the files
+        active_downloads[task_id]['status'] = 'processing'
+        active_downloads[task_id]['pipeline_pending'] = len(jobs)
+        publish_task(task_id)
+        for job in jobs:
+            transcode_pool.submit(job)
+        return True
         
     except Exception as e:
         import traceback
@@ -702,6 +3807,21 @@ def index():
     return render_template('index.html', default_folder=DEFAULT_DOWNLOAD_FOLDER)
 
 
+@app.route('/api/classify', methods=['POST'])
+def classify_urls():
+    """Detect platform, type and id for many URLs in one request"""
+    data = request.json or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+        return jsonify({'error': 'urls must be a list of strings'}), 400
+    if len(urls) > CLASSIFY_MAX_URLS:
+        return jsonify({'error': f'At most {CLASSIFY_MAX_URLS} URLs per request'}), 400
+    
+    results = [dict(detect_url_type(url), url=url) for url in urls]
+    counts = Counter(result['platform'] for result in results)
+    return jsonify({'results': results, 'counts': counts})
+
+
 @app.route('/api/info', methods=['POST'])
 def get_info():
     """Get video/playlist information"""
@@ -736,6 +3856,7 @@ def search():
     query = request.args.get('q', '').strip()
     page = request.args.get('page', '1')
     platform = request.args.get('platform', 'youtube').strip()
+    mode = request.args.get('mode', SEARCH_MODE).strip()
     
     try:
         page = max(1, int(page))
@@ -746,10 +3867,13 @@ def search():
         return jsonify({'error': 'Query is required'}), 400
     
     # Results per page
-    per_page = 10
+    per_page = SEARCH_PER_PAGE
     
     try:
-        results = search_media(query, platform)
+        if mode == 'full':
+            results = search_media(query, platform)
+        else:
+            results = search_media_page(query, platform, page, per_page)
         all_results = results.get('results', [])
         total = len(all_results)
         
@@ -759,6 +3883,8 @@ def search():
         end_idx = start_idx + per_page
         
         paginated_results = all_results[start_idx:end_idx]
+        if PREVIEW_PREFETCH_COUNT:
+            prefetch_previews((normalize_search_query(query), platform), paginated_results)
         
         return jsonify({
             'results': paginated_results,
@@ -775,6 +3901,78 @@ def search():
         return jsonify({'error': str(e), 'results': [], 'total': 0})
 
 
+@app.route('/api/search/cache')
+def get_search_cache():
+    """Get search cache statistics"""
+    return jsonify(search_cache.stats())
+
+
+@app.route('/api/search/cache/clear', methods=['POST'])
+def clear_search_cache():
+    """Invalidate cached searches (all, or only one query/platform)"""
+    data = request.json or {}
+    query = data.get('q')
+    platform = data.get('platform')
+    
+    if query is None and platform is None:
+        removed = search_cache.invalidate()
+    else:
+        normalized = normalize_search_query(query) if query is not None else None
+        removed = search_cache.invalidate(
+            lambda key: (normalized is None or key[0] == normalized)
+            and (platform is None or key[1] == platform)
+        )
+    return jsonify({'success': True, 'removed': removed})
+
+
+@app.route('/api/metadata/cache')
+def get_metadata_cache():
+    """Get shared metadata cache statistics"""
+    return jsonify(metadata_cache.stats())
+
+
+@app.route('/api/metadata/cache/clear', methods=['POST'])
+def clear_metadata_cache():
+    """Invalidate all cached info dicts"""
+    removed = metadata_cache.invalidate()
+    metadata_url_aliases.invalidate()
+    return jsonify({'success': True, 'removed': removed})
+
+
+@app.route('/api/thumbnails/cache')
+def get_thumbnail_cache():
+    """Get on-disk thumbnail cache statistics"""
+    return jsonify(thumbnail_cache.stats())
+
+
+@app.route('/api/thumbnails/cache/clear', methods=['POST'])
+def clear_thumbnail_cache():
+    """Delete all cached thumbnails"""
+    removed = thumbnail_cache.clear()
+    return jsonify({'success': True, 'removed': removed})
+
+
+@app.route('/api/cookies')
+def get_cookies_status():
+    """Get the state of the shared browser cookie jar"""
+    with cookie_jar_lock:
+        jar = cookie_jar_state['jar']
+        return jsonify({
+            'browser': COOKIE_BROWSER,
+            'loaded': jar is not None,
+            'count': len(jar) if jar is not None else 0,
+            'age': round(time.monotonic() - cookie_jar_state['loaded_at']) if cookie_jar_state['loaded_at'] else None,
+            'error': cookie_jar_state['error'],
+        })
+
+
+@app.route('/api/cookies/refresh', methods=['POST'])
+def refresh_cookies():
+    """Reload browser cookies now"""
+    jar = get_shared_cookiejar(force=True)
+    return jsonify({'success': jar is not None, 'error': cookie_jar_state['error']})
+
+
 @app.route('/api/download', methods=['POST'])
 def start_download():
     """Start downloading media"""
@@ -788,11 +3986,21 @@ def start_download():
     if not url:
         return jsonify({'error': 'URL is required'}), 400
     
+    options, error = parse_download_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    priority, error = parse_priority(data.get('priority', 0))
+    if error:
+        return jsonify({'error': error}), 400
+    
     task_id = str(uuid.uuid4())
     cancel_flags[task_id] = False
     
-    # Submit download task to thread pool
-    executor.submit(download_media, task_id, url, output_folder, format_type, quality, normalize_volume)
+    # Journal the task, then submit it to the scheduler
+    task = task_record(task_id, url, output_folder, format_type, quality, normalize_volume,
+                       priority, options=options)
+    job_store.add_tasks([task])
+    submit_download(task)
     
     return jsonify({'task_id': task_id, 'status': 'started'})
 
@@ -801,36 +4009,176 @@ def start_download():
 def add_to_queue():
     """Add item to download queue"""
     data = request.json
+    options, error = parse_download_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    priority, error = parse_priority(data.get('priority', 0))
+    if error:
+        return jsonify({'error': error}), 400
     
-    queue_item = {
-        'id': str(uuid.uuid4()),
-        'url': data.get('url', '').strip(),
-        'title': data.get('title', 'Unknown'),
-        'thumbnail': data.get('thumbnail', ''),
-        'format': data.get('format', 'audio'),
-        'quality': data.get('quality', 'mp3'),
-        'normalize': data.get('normalize', False),
-        'status': 'pending',
-        'added_at': datetime.now().isoformat(),
-    }
+    queue_item = new_queue_item(
+        data.get('url', '').strip(), data.get('title', 'Unknown'), data.get('thumbnail', ''),
+        data.get('format', 'audio'), data.get('quality', 'mp3'), data.get('normalize', False),
+        priority, options,
+    )
     
     with queue_lock:
         download_queue.append(queue_item)
+        job_store.save_queue_items([queue_item], start=len(download_queue) - 1)
+    queue_item_changed(queue_item['id'], queue_item)
     
     return jsonify({'success': True, 'item': queue_item})
 
 
+@app.route('/api/queue/import', methods=['POST'])
+def import_queue():
+    """Add many URLs to the queue from a text, CSV or JSON upload
+    
+    Accepts a multipart 'file' field or a raw request body. Settings come
+    from form fields or query arguments (format, quality, normalize,
+    priority, connection options). URLs already queued, already in the
+    download archive in the same format, or repeated in the upload are
+    skipped. Returns counts only.
+    """
+    settings = request.values
+    options, error = parse_download_options(settings)
+    if error:
+        return jsonify({'error': error}), 400
+    format_type = settings.get('format', 'audio')
+    quality = settings.get('quality', 'mp3')
+    normalize = settings.get('normalize', 'false').lower() in ('1', 'true', 'on')
+    priority, error = parse_priority(settings.get('priority', 0))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    upload = request.files.get('file')
+    if upload is not None:
+        raw, kind = upload.stream, import_kind(upload.filename, upload.content_type)
+    else:
+        raw, kind = request.stream, import_kind(None, request.content_type)
+    stream = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+    
+    with queue_lock:
+        queued = {media_identity(item['url']) for item in download_queue}
+    
+    counts = Counter()
+    platforms = Counter()
+    seen = set()
+    candidates = []  # (identity, platform, queue item)
+    try:
+        for url, title in iter_import_rows(stream, kind):
+            counts['rows'] += 1
+            url = (url or '').strip()
+            if '://' not in url and '.' in url:
+                url = 'https://' + url
+            if not url.startswith(('http://', 'https://')) or not url_host(url):
+                counts['invalid'] += 1
+                continue
+            url_info = detect_url_type(url)
+            identity = media_identity(url, url_info)
+            if identity in queued:
+                counts['duplicate_queue'] += 1
+                continue
+            if identity in seen:
+                counts['duplicate_input'] += 1
+                continue
+            seen.add(identity)
+            if len(candidates) >= IMPORT_MAX_ITEMS:
+                counts['over_limit'] += 1
+                continue
+            thumbnail = f"https://i.ytimg.com/vi/{identity[1]}/hqdefault.jpg" if identity[0] == 'youtube' else ''
+            candidates.append((identity, url_info['platform'], new_queue_item(
+                url, title or url, thumbnail, format_type, quality, normalize, priority, options)))
+    except (ValueError, csv.Error) as e:
+        return jsonify({'error': f'Could not parse the upload: {str(e)}'}), 400
+    
+    # One batched archive lookup for the whole upload
+    quality_key = archive_quality(format_type, quality)
+    archived = job_store.archive_find(
+        format_type, quality_key,
+        video_ids=[identity[1] for identity, _, _ in candidates if identity[0] == 'youtube'],
+        urls=[identity[1] for identity, _, _ in candidates if identity[0] == 'url'],
+    )
+    archived_keys = set()
+    for entry in archived:
+        if not os.path.exists(entry['path']):
+            continue
+        if entry['extractor'] == 'Youtube':
+            archived_keys.add(('youtube', entry['video_id']))
+        if entry['url']:
+            archived_keys.add(media_identity(entry['url']))
+    new_items = []
+    for identity, platform, item in candidates:
+        if identity in archived_keys:
+            counts['duplicate_archive'] += 1
+        else:
+            new_items.append(item)
+            platforms[platform] += 1
+    
+    with queue_lock:
+        start = len(download_queue)
+        download_queue.extend(new_items)
+        job_store.save_queue_items(new_items, start=start)
+    for item in new_items:
+        queue_changes.touch(item['id'])
+    # One event instead of one per item; clients refetch with ?since=
+    event_broker.publish('queue', 'import', {'imported': len(new_items), 'version': queue_changes.version})
+    
+    return jsonify({
+        'success': True,
+        'imported': len(new_items),
+        'rows': counts['rows'],
+        'invalid': counts['invalid'],
+        'duplicates': {
+            'queue': counts['duplicate_queue'],
+            'input': counts['duplicate_input'],
+            'archive': counts['duplicate_archive'],
+        },
+        'over_limit': counts['over_limit'],
+        'platforms': platforms,
+        'version': queue_changes.version,
+    })
+
+
 @app.route('/api/queue', methods=['GET'])
 def get_queue():
-    """Get download queue"""
-    return jsonify({'queue': download_queue})
+    """Get download queue, or with ?since=<version> only the items changed after it"""
+    since = request.args.get('since', type=int)
+    changes = queue_changes.since(since) if since is not None else None
+    if changes is None:
+        with queue_lock:
+            return jsonify({'queue': download_queue, 'version': queue_changes.version, 'full': True})
+    
+    version, changed, removed = changes
+    with queue_lock:
+        items = {item['id']: item for item in download_queue} if changed else {}
+        response = {
+            'version': version,
+            'full': False,
+            'changed': [items[item_id] for item_id in changed if item_id in items],
+            'removed': removed,
+        }
+        if queue_order_version > since:
+            response['order'] = [item['id'] for item in download_queue]
+    return jsonify(response)
 
 
 @app.route('/api/queue/<item_id>', methods=['DELETE'])
 def remove_from_queue(item_id):
     """Remove item from queue"""
     with queue_lock:
+        removed = [item for item in download_queue if item['id'] == item_id]
         download_queue[:] = [item for item in download_queue if item['id'] != item_id]
+    job_store.delete_queue_item(item_id)
+    if removed:
+        queue_changes.remove(item_id)
+        event_broker.publish('queue', item_id, {'removed': True})
+        event_broker.forget('queue', item_id)
+    
+    # Don't leave a scheduled job behind for an item that no longer exists
+    for item in removed:
+        if item.get('task_id') and item['status'] == 'queued':
+            cancel_task(item['task_id'])
     return jsonify({'success': True})
 
 
@@ -841,42 +4189,345 @@ def start_queue():
     
     with queue_lock:
         pending_items = [item for item in download_queue if item['status'] == 'pending']
+        for item in pending_items:
+            item['status'] = 'queued'
+            item['task_id'] = str(uuid.uuid4())
+            cancel_flags[item['task_id']] = False
+        tasks = [
+            task_record(item['task_id'], item['url'], DEFAULT_DOWNLOAD_FOLDER, item['format'],
+                        item['quality'], item.get('normalize', False), item.get('priority', 0),
+                        title=item.get('title'),
+                        options=parse_download_options(item)[0])
+            for item in pending_items
+        ]
+        # One transaction for the whole batch
+        job_store.add_tasks(tasks)
+        job_store.save_queue_items(download_queue)
     
-    for item in pending_items:
-        task_id = str(uuid.uuid4())
-        cancel_flags[task_id] = False
-        
-        item['status'] = 'downloading'
-        item['task_id'] = task_id
-        
-        executor.submit(
-            download_media, 
-            task_id, 
-            item['url'], 
-            DEFAULT_DOWNLOAD_FOLDER,
-            item['format'],
-            item['quality'],
-            item.get('normalize', False)
-        )
-        
-        results.append({'item_id': item['id'], 'task_id': task_id})
+    # Items are handed over in queue order; the scheduler starts them by
+    # priority, then in that order
+    for item, task in zip(pending_items, tasks):
+        queue_item_changed(item['id'], {'status': 'queued', 'task_id': item['task_id']})
+        submit_download(task)
+        results.append({'item_id': item['id'], 'task_id': task['task_id']})
     
     return jsonify({'started': results})
 
 
+@app.route('/api/queue/reorder', methods=['POST'])
+def reorder_queue():
+    """Reorder the queue; items not yet started follow the new order"""
+    data = request.json or {}
+    order = data.get('order', [])
+    
+    with queue_lock:
+        position = {item_id: index for index, item_id in enumerate(order)}
+        download_queue.sort(key=lambda item: position.get(item['id'], len(position)))
+        task_ids = [item['task_id'] for item in download_queue if item.get('task_id')]
+        job_store.save_queue_items(download_queue)
+        item_ids = [item['id'] for item in download_queue]
+    
+    scheduler.reorder(task_ids)
+    global queue_order_version
+    queue_order_version = queue_changes.touch('order')
+    event_broker.publish('queue', 'order', {'order': item_ids})
+    return jsonify({'success': True})
+
+
+@app.route('/api/queue/<item_id>/priority', methods=['POST'])
+def set_queue_item_priority(item_id):
+    """Change the priority of a queue item (higher starts first)"""
+    data = request.json or {}
+    priority, error = parse_priority(data.get('priority', 0))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    with queue_lock:
+        item = next((i for i in download_queue if i['id'] == item_id), None)
+        if item is None:
+            return jsonify({'error': 'Item not found'}), 404
+        item['priority'] = priority
+        task_id = item.get('task_id')
+        job_store.update_queue_item(item)
+    queue_item_changed(item_id, {'priority': priority})
+    
+    if task_id:
+        scheduler.set_priority(task_id, priority)
+    return jsonify({'success': True, 'item': item})
+
+
+@app.route('/api/queue/pause', methods=['POST'])
+def pause_queue():
+    """Stop starting new downloads (running ones continue)"""
+    scheduler.pause()
+    return jsonify({'success': True, 'paused': True})
+
+
+@app.route('/api/queue/resume', methods=['POST'])
+def resume_queue():
+    """Resume starting queued downloads"""
+    scheduler.resume()
+    return jsonify({'success': True, 'paused': False})
+
+
+@app.route('/api/scheduler')
+def get_scheduler():
+    """Get scheduler state: limits, running and pending jobs"""
+    return jsonify(dict(scheduler.snapshot(), connections=connection_budget.stats()))
+
+
+@app.route('/api/scheduler/settings', methods=['POST'])
+def update_scheduler_settings():
+    """Change the concurrency limits at runtime"""
+    data = request.json or {}
+    max_parallel = data.get('max_parallel')
+    platform_limits = data.get('platform_limits')
+    max_connections = data.get('max_connections')
+    
+    try:
+        if max_connections is not None:
+            max_connections = int(max_connections)
+            if max_connections < 1:
+                raise ValueError
+        if max_parallel is not None:
+            max_parallel = int(max_parallel)
+            if max_parallel < 1:
+                raise ValueError
+        if platform_limits is not None:
+            platform_limits = {str(p): int(n) for p, n in platform_limits.items()}
+            if any(n < 1 for n in platform_limits.values()):
+                raise ValueError
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Limits must be positive integers'}), 400
+    
+    scheduler.configure(max_parallel, platform_limits)
+    if max_connections is not None:
+        connection_budget.configure(max_connections)
+    return jsonify(dict(scheduler.snapshot(), connections=connection_budget.stats()))
+
+
+@app.route('/api/bandwidth')
+def get_bandwidth():
+    """Get the bandwidth limit, schedule, measured rate and headroom"""
+    return jsonify(bandwidth_governor.stats())
+
+
+@app.route('/api/bandwidth/settings', methods=['POST'])
+def update_bandwidth_settings():
+    """Change the global rate limit (bytes/s, 0 = unlimited) and time-of-day schedule"""
+    data = request.json or {}
+    rate = data.get('rate')
+    schedule = data.get('schedule')
+    
+    try:
+        if rate is not None:
+            rate = int(rate)
+            if rate < 0:
+                raise ValueError
+        if schedule is not None:
+            schedule = parse_bandwidth_schedule(schedule)
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return jsonify({'error': "rate must be >= 0 and schedule windows need start/end (HH:MM) and rate"}), 400
+    
+    bandwidth_governor.configure(rate, schedule)
+    stats = bandwidth_governor.stats()
+    event_broker.publish('bandwidth', 'settings', {'rate': stats['rate'], 'current_rate': stats['current_rate'],
+                                                   'schedule': stats['schedule']})
+    return jsonify(stats)
+
+
+@app.route('/api/archive')
+def get_archive():
+    """List download archive entries (?platform=, ?id=, ?q=, ?limit=, ?offset=)"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    entries, total = job_store.archive_query(
+        request.args.get('platform'), request.args.get('id'), request.args.get('q'), limit, offset)
+    return jsonify({'entries': entries, 'total': total})
+
+
+@app.route('/api/archive/check')
+def check_archive():
+    """Tell whether a URL is already archived in a format (?url=, ?format=, ?quality=)"""
+    url = request.args.get('url', '').strip()
+    if not url:
+        return jsonify({'error': 'URL is required'}), 400
+    key = media_cache_key(url)
+    if key is None:
+        return jsonify({'archived': False, 'known': False})
+    format_type = request.args.get('format', 'audio')
+    quality = archive_quality(format_type, request.args.get('quality', 'mp3'))
+    entry = find_archived(*key, format_type, quality)
+    return jsonify({'archived': entry is not None, 'known': True, 'entry': entry})
+
+
+@app.route('/api/archive/prune', methods=['POST'])
+def prune_archive():
+    """Remove archive entries whose files no longer exist"""
+    missing = [
+        (row['extractor'], row['video_id'], row['format_type'], row['quality'])
+        for row in job_store.archive_paths()
+        if not os.path.exists(row['path'])
+    ]
+    job_store.archive_delete(missing)
+    return jsonify({'success': True, 'removed': len(missing)})
+
+
+@app.route('/api/pipeline')
+def get_pipeline():
+    """Get per-stage worker counts and queue depths"""
+    snapshot = scheduler.snapshot()
+    return jsonify({
+        'fetch': {
+            'workers': snapshot['max_parallel'],
+            'queued': len(snapshot['pending']),
+            'active': len(snapshot['running']),
+        },
+        'transcode': transcode_pool.stats(),
+        'tag': tag_pool.stats(),
+        'record': record_pool.stats(),
+    })
+
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Stage timings, counters and gauges in the Prometheus text format"""
+    snapshot = scheduler.snapshot()
+    with queue_lock:
+        waiting = sum(1 for item in download_queue if item.get('status') == 'pending')
+    samples = [
+        ('ytextractor_queue_depth', {'queue': 'list'}, waiting),
+        ('ytextractor_queue_depth', {'queue': 'fetch'}, len(snapshot['pending'])),
+        ('ytextractor_active_workers', {'stage': 'fetch'}, len(snapshot['running'])),
+        ('ytextractor_connections_in_use', {}, connection_budget.stats()['in_use']),
+        ('ytextractor_event_subscribers', {}, event_broker.subscriber_count()),
+    ]
+    registry = active_downloads.stats()
+    samples.append(('ytextractor_tasks_in_memory', {}, registry['tasks']))
+    samples.append(('ytextractor_tasks_evicted_total', {}, registry['evicted']))
+    for stage in (transcode_pool, tag_pool, record_pool):
+        stats = stage.stats()
+        samples.append(('ytextractor_queue_depth', {'queue': stage.name}, stats['queued']))
+        samples.append(('ytextractor_active_workers', {'stage': stage.name}, stats['active']))
+    for name, cache in (('search', search_cache), ('metadata', metadata_cache), ('thumbnail', thumbnail_cache)):
+        stats = cache.stats()
+        samples.append(('ytextractor_cache_hits_total', {'cache': name}, stats['hits']))
+        samples.append(('ytextractor_cache_misses_total', {'cache': name}, stats['misses']))
+    return Response(metrics.render(samples), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/profiles')
+def get_profiles():
+    """List the stored task profiles, newest first"""
+    return jsonify({'profiles': profile_store.list(), 'keep': profile_store.keep})
+
+
+@app.route('/api/profiles/<profile_id>')
+def get_profile(profile_id):
+    """Get one profile summary, or its raw pstats dump with ?format=pstats"""
+    if request.args.get('format') == 'pstats':
+        path = profile_store.pstats_path(profile_id)
+        if path is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f'{profile_id}.prof')
+    summary = profile_store.get(profile_id)
+    if summary is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(summary)
+
+
+@app.route('/api/progress')
+def get_progress_batch():
+    """Get progress for several tasks: ?ids=a,b,c and/or ?since=<version>"""
+    ids = [task_id for task_id in request.args.get('ids', '').split(',') if task_id]
+    since = request.args.get('since', type=int)
+    if not ids and since is None:
+        return jsonify({'error': 'ids or since is required'}), 400
+    
+    response = {'version': task_changes.version}
+    if since is not None:
+        changes = task_changes.since(since)
+        if changes is None:
+            ids.extend(list(active_downloads))
+            response['full'] = True
+        else:
+            response['version'], changed, removed = changes
+            ids.extend(changed)
+            response['full'] = False
+            response['removed'] = removed  # Finished tasks evicted from memory
+    
+    tasks = {}
+    missing = []
+    for task_id in dict.fromkeys(ids):
+        progress = get_task_progress(task_id)
+        if progress is not None:
+            tasks[task_id] = progress
+        else:
+            missing.append(task_id)
+    response['tasks'] = tasks
+    response['missing'] = missing
+    return jsonify(response)
+
+
 @app.route('/api/progress/<task_id>')
 def get_progress(task_id):
     """Get download progress"""
-    if task_id not in active_downloads:
+    progress = get_task_progress(task_id)
+    if progress is None:
         return jsonify({'error': 'Task not found'}), 404
     
-    return jsonify(active_downloads[task_id])
+    return jsonify(progress)
+
+
+@app.route('/api/events')
+def stream_events():
+    """Server-Sent Events stream of task, queue and history changes
+    
+    Each event carries only the fields that changed since the last one for
+    the same id. Updates are coalesced and flushed at most `rate` times a
+    second (default EVENTS_RATE), so a fast download costs the same as a
+    slow one.
+    """
+    try:
+        rate = float(request.args.get('rate', EVENTS_RATE))
+    except ValueError:
+        return jsonify({'error': 'rate must be a number'}), 400
+    interval = 1.0 / min(max(rate, 0.1), EVENTS_MAX_RATE)
+    
+    subscriber = event_broker.subscribe()
+    
+    def generate():
+        try:
+            yield 'retry: 2000\n\n'
+            last_sent = time.monotonic()
+            while True:
+                updates = subscriber.drain(EVENTS_HEARTBEAT)
+                if not updates:
+                    if time.monotonic() - last_sent >= EVENTS_HEARTBEAT:
+                        last_sent = time.monotonic()
+                        yield ': keepalive\n\n'
+                    continue
+                chunks = []
+                for (kind, key), delta in updates.items():
+                    payload = dict(delta, id=key)
+                    chunks.append(f"event: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n")
+                yield ''.join(chunks)
+                last_sent = time.monotonic()
+                time.sleep(interval)
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
 
 
 @app.route('/api/cancel/<task_id>', methods=['POST'])
 def cancel_download(task_id):
     """Cancel a download"""
-    cancel_flags[task_id] = True
+    cancel_task(task_id)
     return jsonify({'success': True, 'message': 'Cancel requested'})
 
 
@@ -889,9 +4540,10 @@ def get_history():
 @app.route('/api/history/clear', methods=['POST'])
 def clear_history():
     """Clear download history"""
-    global download_history
-    download_history = []
-    save_history()
+    with queue_lock:
+        download_history.clear()
+    history_store.clear()
+    event_broker.broadcast('history', 'cleared', {'cleared': datetime.now().isoformat()})
     return jsonify({'success': True})
 
 
@@ -920,6 +4572,14 @@ def check_ffmpeg():
     })
 
 
+@app.route('/api/warmup', methods=['GET', 'POST'])
+def warmup():
+    """Start the background warm-up (POST, sent by the page once it is painted) or get its state"""
+    if request.method == 'POST':
+        start_warm_up()
+    return jsonify(warmup_state)
+
+
 @app.route('/api/preview-audio', methods=['POST'])
 def preview_audio():
     """Get audio stream URL for preview playback"""
@@ -930,48 +4590,91 @@ def preview_audio():
         return jsonify({'error': 'URL is required'}), 400
     
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'format': 'bestaudio/best',
-            'skip_download': True,
-        }
-        
-        # Explicitly set ffmpeg location
-        ffmpeg_loc = get_ffmpeg_path()
-        if ffmpeg_loc:
-            ydl_opts['ffmpeg_location'] = ffmpeg_loc
+        # Search results are usually prefetched (see prefetch_previews)
+        entry = cached_preview(url) or resolve_preview(url)
+        if entry is None:
+            return jsonify({'error': 'Could not extract audio URL'}), 400
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            if info:
-                # Get the best audio format URL
-                audio_url = None
-                
-                # Try to get direct audio URL from formats
-                for fmt in info.get('formats', []):
-                    if fmt.get('acodec') != 'none' and fmt.get('url'):
-                        audio_url = fmt.get('url')
-                        break
-                
-                if not audio_url:
-                    audio_url = info.get('url')
-                
-                return jsonify({
-                    'success': True,
-                    'audio_url': audio_url,
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                })
-            
-        return jsonify({'error': 'Could not extract audio URL'}), 400
+        # Plain HTTP streams play through the local proxy; others (HLS...) directly
+        audio_url = f"/api/preview/{entry['id']}/stream" if entry['proxied'] else entry['stream_url']
+        return jsonify({
+            'success': True,
+            'audio_url': audio_url,
+            'preview_id': entry['id'],
+            'title': entry['title'],
+            'duration': entry['duration'],
+        })
         
     except Exception as e:
         log_error(f"Audio preview error: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
 
+@app.route('/api/preview/<preview_id>/stream')
+def stream_preview(preview_id):
+    """Proxy a preview's audio with Range support, starting from the disk cache when possible"""
+    if not PREVIEW_ID_PATTERN.fullmatch(preview_id):
+        return jsonify({'error': 'Preview not found'}), 404
+    
+    match = re.fullmatch(r'bytes=(\d+)-(\d*)', request.headers.get('Range', '').strip())
+    start = int(match.group(1)) if match else 0
+    end = int(match.group(2)) if match and match.group(2) else None
+    
+    cached = preview_cache.get(preview_id)
+    if cached is not None and start < min(cached['length'], cached['size']):
+        total = cached['size']
+        end = total - 1 if end is None else min(end, total - 1)
+        body = preview_cached_body(preview_id, cached, start, end)
+        return preview_response(body, start, end, total, cached['content_type'], ranged=bool(match))
+    
+    try:
+        entry = preview_streams.get(preview_id)
+        if entry is None and cached is not None:
+            entry = resolve_preview(cached['page_url'])
+        if entry is None:
+            return jsonify({'error': 'Preview not found'}), 404
+        response, entry = open_preview_upstream(entry, start, end)
+    except Exception as e:
+        log_error(f"Audio preview stream error: {str(e)}")
+        return jsonify({'error': str(e)}), 502
+    if response is None:
+        return jsonify({'error': 'Audio stream unavailable'}), 502
+    if response.status_code == 416:
+        response.close()
+        return Response(status=416, headers={'Content-Range': response.headers.get('Content-Range', 'bytes */0')})
+    
+    total_match = UPSTREAM_TOTAL_PATTERN.search(response.headers.get('Content-Range', ''))
+    if total_match:
+        total = int(total_match.group(1))
+    elif response.status_code == 200 and response.headers.get('Content-Length'):
+        total = int(response.headers['Content-Length'])
+    else:
+        total = None
+    if total is not None:
+        end = total - 1 if end is None else min(end, total - 1)
+    length = end - start + 1 if end is not None else None
+    content_type = response.headers.get('Content-Type', 'application/octet-stream')
+    body = preview_upstream_body(preview_id, entry, response, start, length, total, content_type)
+    return preview_response(body, start, end, total, content_type, ranged=bool(match))
+
+
+@app.route('/api/preview/cache')
+def get_preview_cache():
+    """Get audio preview cache statistics"""
+    with preview_prefetch_lock:
+        futures = list(preview_prefetch_state['futures'].values())
+    return jsonify({
+        'streams': preview_streams.stats(),
+        'disk': preview_cache.stats(),
+        'prefetch': {
+            'query': preview_prefetch_state['query'],
+            'pending': sum(1 for f in futures if not f.done()),
+            'done': sum(1 for f in futures if f.done() and not f.cancelled()),
+            'cancelled': sum(1 for f in futures if f.cancelled()),
+        },
+    })
+
+
 # ============== AUTO-UPDATE SYSTEM ==============
 
 @app.route('/api/version')
@@ -988,7 +4691,7 @@ def get_version():
 def check_update():
     """Check if a new version is available on GitHub"""
     try:
-        response = requests.get(GITHUB_API_URL, timeout=10)
+        response = http_session.get(GITHUB_API_URL, timeout=HTTP_TIMEOUT)
         
         if response.status_code == 200:
             release_data = response.json()
@@ -1045,7 +4748,7 @@ def download_update():
         
         if not download_url:
             # Get the download URL from GitHub
-            response = requests.get(GITHUB_API_URL, timeout=10)
+            response = http_session.get(GITHUB_API_URL, timeout=HTTP_TIMEOUT)
             if response.status_code == 200:
                 release_data = response.json()
                 target_asset = None
@@ -1065,7 +4768,7 @@ def download_update():
             return jsonify({'success': False, 'error': 'No download URL found'}), 400
         
         # Download the new exe
-        response = requests.get(download_url, stream=True, timeout=300)
+        response = http_session.get(download_url, stream=True, timeout=300)
         
         if response.status_code == 200:
             # Get the current exe path
@@ -1160,7 +4863,7 @@ if __name__ == '__main__':
     print("🎵 YouTube Media Extractor - Advanced Edition")
     print("="*60)
     print(f"\n📂 Default download folder: {DEFAULT_DOWNLOAD_FOLDER}")
-    print(f"📜 History file: {HISTORY_FILE}")
+    print(f"📜 History file: {HISTORY_LOG_FILE}")
     print(f"🔧 ID3 Tags: {'✓ Enabled' if MUTAGEN_AVAILABLE else '✗ Disabled (install mutagen)'}")
     print(f"🔔 Notifications: {'✓ Enabled' if TOAST_AVAILABLE else '✗ Disabled (install win10toast)'}")
     print("\n🌐 Open your browser at: http://localhost:5000")
@@ -1170,7 +4873,8 @@ if __name__ == '__main__':
     # Create default download folder
     os.makedirs(DEFAULT_DOWNLOAD_FOLDER, exist_ok=True)
     
-    # Load history
+    # Load history and re-queue jobs interrupted by the last shutdown
     load_history()
+    resume_jobs()
     
-    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False, threaded=False)
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False, threaded=True)
@@ -0,0 +1,126 @@
+"""
+Benchmark - URL classification
+Compares detect_url_type with the previous implementation (lowercase the URL,
+then try each platform regex and each YouTube regex in turn) on a mixed set
+of URLs, and lists the URLs the two classify differently.
+
+Usage: python benchmarks/bench_classify.py [--urls 20000] [--repeat 5]
+"""
+
+import os
+import re
+import sys
+import random
+import string
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+def legacy_detect_url_type(url):
+    """detect_url_type as it was before the host-based classifier"""
+    url = url.strip().lower()
+    
+    platform_patterns = {
+        'youtube': r'(?:youtube\.com|youtu\.be)',
+        'tiktok': r'(?:tiktok\.com|vm\.tiktok\.com)',
+        'soundcloud': r'soundcloud\.com',
+        'vimeo': r'vimeo\.com',
+        'dailymotion': r'(?:dailymotion\.com|dai\.ly)',
+        'instagram': r'(?:instagram\.com|instagr\.am)',
+        'twitter': r'(?:twitter\.com|x\.com)',
+        'facebook': r'(?:facebook\.com|fb\.watch|fb\.com)',
+        'twitch': r'(?:twitch\.tv|clips\.twitch\.tv)',
+        'reddit': r'(?:reddit\.com|v\.redd\.it)',
+        'pinterest': r'pinterest\.com',
+        'bandcamp': r'bandcamp\.com',
+        'bilibili': r'(?:bilibili\.com|b23\.tv)',
+        'spotify': r'(?:spotify\.com|open\.spotify\.com)',
+        'tumblr': r'tumblr\.com',
+        'linkedin': r'linkedin\.com',
+        'ted': r'(?:ted\.com|tedtalks)',
+    }
+    
+    platform = 'unknown'
+    for plat, pattern in platform_patterns.items():
+        if re.search(pattern, url):
+            platform = plat
+            break
+    
+    youtube_patterns = {
+        'short': r'(?:youtu\.be/|youtube\.com/shorts/)([a-zA-Z0-9_-]{11})',
+        'video': r'(?:youtube\.com/watch\?v=|youtube\.com/v/)([a-zA-Z0-9_-]{11})',
+        'playlist': r'youtube\.com/playlist\?list=([a-zA-Z0-9_-]+)',
+        'channel': r'youtube\.com/(?:c/|channel/|@)([a-zA-Z0-9_-]+)',
+        'live': r'youtube\.com/live/([a-zA-Z0-9_-]{11})',
+    }
+    
+    if platform == 'youtube':
+        for url_type, pattern in youtube_patterns.items():
+            match = re.search(pattern, url)
+            if match:
+                return {'type': url_type, 'id': match.group(1), 'platform': 'youtube'}
+    
+    return {'type': 'video', 'id': None, 'platform': platform}
+
+
+def random_id(length=11):
+    return ''.join(random.choices(string.ascii_letters + string.digits + '_-', k=length))
+
+
+def make_urls(count):
+    """Mixed URLs, weighted towards YouTube like real queues"""
+    templates = [
+        lambda: f'https://www.youtube.com/watch?v={random_id()}',
+        lambda: f'https://youtu.be/{random_id()}',
+        lambda: f'https://www.youtube.com/shorts/{random_id()}',
+        lambda: f'https://www.youtube.com/playlist?list=PL{random_id(32)}',
+        lambda: f'https://www.youtube.com/@channel{random.randint(1, 999)}',
+        lambda: f'https://www.tiktok.com/@user/video/{random.randint(10**18, 10**19)}',
+        lambda: f'https://soundcloud.com/artist/track-{random.randint(1, 9999)}',
+        lambda: f'https://vimeo.com/{random.randint(10**6, 10**9)}',
+        lambda: f'https://www.instagram.com/reel/{random_id()}/',
+        lambda: f'https://x.com/user/status/{random.randint(10**17, 10**18)}',
+        lambda: f'https://example.org/media/{random_id()}.mp4',
+    ]
+    weights = [6, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+    return [random.choices(templates, weights)[0]() for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=20000, help='URLs per run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per implementation (best is reported)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    urls = make_urls(args.urls)
+
+    print(f"{'implementation':<16} {'best run':>10} {'per URL':>10}")
+    results = {}
+    for name, fn in (('legacy', legacy_detect_url_type), ('host-based', app.detect_url_type)):
+        best = min(timeit.repeat(lambda: [fn(u) for u in urls], number=1, repeat=args.repeat))
+        results[name] = best
+        print(f"{name:<16} {best * 1000:>8.1f}ms {best / len(urls) * 1e6:>8.2f}us")
+    print(f"speedup: {results['legacy'] / results['host-based']:.1f}x")
+
+    # The legacy version lowercased YouTube ids; report any other difference
+    differences = [
+        (u, legacy_detect_url_type(u), app.detect_url_type(u)) for u in urls
+        if legacy_detect_url_type(u) != app.detect_url_type(u)
+    ]
+    id_case_only = sum(
+        1 for _, old, new in differences
+        if old['platform'] == new['platform'] and old['type'] == new['type']
+        and (old['id'] or '').lower() == (new['id'] or '').lower()
+    )
+    print(f"differences: {len(differences)} ({id_case_only} only in id case, which the old version lost)")
+    for url, old, new in [d for d in differences if (d[1]['id'] or '').lower() != (d[2]['id'] or '').lower()][:10]:
+        print(f"  {url}\n    legacy: {old}\n    new:    {new}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark - Extractor invocations per download task
+Runs download_media against stub extractors and a local HTTP server (no network)
+and reports how many times an extractor ran for each task.
+
+Usage: python benchmarks/bench_extraction.py [--entries 50]
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from stub_media import extract_calls, setup_app
+
+TASK_TIMEOUT = 120  # seconds before a task that never finishes is reported
+
+
+def run_task(url, output_folder):
+    """Run one download task and return (extractor calls, files, seconds)"""
+    extract_calls.clear()
+    app.metadata_cache.invalidate()
+    app.metadata_url_aliases.invalidate()
+    task_id = f'bench-{time.monotonic_ns()}'
+    app.cancel_flags[task_id] = False
+
+    start = time.perf_counter()
+    # yt-dlp prints progress even when quiet; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        app.download_media(task_id, url, output_folder, format_type='video', quality='best')
+        # Playlists fan out into child tasks on the worker pool
+        deadline = time.perf_counter() + TASK_TIMEOUT
+        while app.active_downloads[task_id]['status'] not in app.FINISHED_STATUSES:
+            if time.perf_counter() > deadline:
+                break  # Reported below as not completed
+            time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    state = app.active_downloads[task_id]
+    if state['status'] != 'completed':
+        print(f"  ! {url}: {state['status']} {state.get('error', '')}")
+    return sum(extract_calls.values()), len(state['files']), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=50, help='playlist size')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        setup_app(root)
+        output_folder = app.DEFAULT_DOWNLOAD_FOLDER
+
+        scenarios = [
+            ('single video', 'stub://video/single'),
+            (f'playlist ({args.entries})', f'stub://playlist/{args.entries}'),
+            ('channel (2+3)', 'stub://channel/2,3'),  # tabs are nested playlists
+        ]
+        print(f"{'scenario':<20} {'extractions':>12} {'per entry':>10} {'files':>6} {'time':>8}")
+        for name, url in scenarios:
+            calls, files, elapsed = run_task(url, os.path.join(output_folder, name.split()[0]))
+            per_entry = calls / max(files, 1)
+            print(f"{name:<20} {calls:>12} {per_entry:>10.2f} {files:>6} {elapsed:>7.2f}s")
+        app.history_store.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Benchmark - Offline download pipeline suite
+Runs the download path (scheduler -> download_media -> pipeline), get_video_info
+and search_media against the local stand-in media server and stub extractors
+from stub_media.py; nothing touches the network.
+
+Each scenario runs in its own process so peak RSS is per scenario:
+  single     20 progressive videos, one after another
+  hls, dash  10 HLS / DASH videos, one after another
+  playlist   one 500-entry playlist, fanned out over the scheduler (per-entry latency)
+  parallel   10 tasks submitted at once
+  cancel     50 slow HLS tasks, all cancelled while running (cancel latency)
+  info       get_video_info on a 500-entry playlist, 5 times, cold cache
+  search     search_media for 20 different queries, cold cache
+
+Usage: python benchmarks/bench_pipeline.py [--scenario NAME ...] [--json out.json] [--compare baseline.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCENARIOS = ('single', 'hls', 'dash', 'playlist', 'parallel', 'cancel', 'info', 'search')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (None for no values)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# ============== SCENARIOS (run in a child process) ==============
+
+def submit(app, url, output_folder, priority=0):
+    task_id = f'bench-{time.monotonic_ns()}'
+    app.cancel_flags[task_id] = False
+    app.submit_download(app.task_record(task_id, url, output_folder, 'video', 'best', False, priority))
+    return task_id
+
+
+def wait_all(app, task_ids, timeout=600):
+    """Poll until every task finished; returns {task_id: (first active time, finish time)}"""
+    times = {}
+    pending = set(task_ids)
+    deadline = time.perf_counter() + timeout
+    while pending and time.perf_counter() < deadline:
+        now = time.perf_counter()
+        for task_id in list(pending):
+            state = app.active_downloads.get(task_id)
+            if state is None:
+                continue
+            started, _ = times.get(task_id, (None, None))
+            if started is None and state['status'] not in ('pending', 'queued'):
+                started = now
+            if state['status'] in app.FINISHED_STATUSES:
+                times[task_id] = (started or now, now)
+                pending.discard(task_id)
+            else:
+                times[task_id] = (started, None)
+        time.sleep(0.002)
+    return times
+
+
+def task_bytes(app, task_ids):
+    return sum(f.get('size', 0) for t in task_ids for f in app.active_downloads[t]['files'])
+
+
+def sequential(app, root, urls):
+    latencies = []
+    task_ids = []
+    start = time.perf_counter()
+    for url in urls:
+        t0 = time.perf_counter()
+        task_id = submit(app, url, os.path.join(root, 'out'))
+        wait_all(app, [task_id])
+        latencies.append(time.perf_counter() - t0)
+        task_ids.append(task_id)
+    elapsed = time.perf_counter() - start
+    return {'ops': len(urls), 'elapsed': elapsed, 'latencies': latencies,
+            'bytes': task_bytes(app, task_ids), 'failed': failed(app, task_ids)}
+
+
+def failed(app, task_ids):
+    return sum(1 for t in task_ids if app.active_downloads[t]['status'] != 'completed')
+
+
+def scenario_single(app, root):
+    return sequential(app, root, [f'stub://video/single{i}' for i in range(20)])
+
+
+def scenario_hls(app, root):
+    return sequential(app, root, [f'stub://hls/h{i}' for i in range(10)])
+
+
+def scenario_dash(app, root):
+    return sequential(app, root, [f'stub://dash/d{i}' for i in range(10)])
+
+
+def scenario_playlist(app, root):
+    start = time.perf_counter()
+    parent = submit(app, 'stub://playlist/500', os.path.join(root, 'out'))
+    # Children are only known once the playlist fanned out
+    while 'children' not in app.active_downloads.get(parent, {}) and \
+            app.active_downloads.get(parent, {}).get('status') not in app.FINISHED_STATUSES:
+        time.sleep(0.002)
+    fanned_out = time.perf_counter() - start
+    children = app.active_downloads[parent].get('children', [])
+    times = wait_all(app, children)
+    wait_all(app, [parent])
+    elapsed = time.perf_counter() - start
+    return {'ops': len(children), 'elapsed': elapsed,
+            'latencies': [finish - started for started, finish in times.values()],
+            'bytes': task_bytes(app, children), 'failed': failed(app, children),
+            'extra': {'fan_out_seconds': round(fanned_out, 3)}}
+
+
+def scenario_parallel(app, root):
+    start = time.perf_counter()
+    task_ids = [submit(app, f'stub://video/par{i}', os.path.join(root, 'out')) for i in range(10)]
+    times = wait_all(app, task_ids)
+    elapsed = time.perf_counter() - start
+    return {'ops': len(task_ids), 'elapsed': elapsed,
+            'latencies': [finish - start for _, finish in times.values()],
+            'bytes': task_bytes(app, task_ids), 'failed': failed(app, task_ids)}
+
+
+def scenario_cancel(app, root):
+    app.scheduler.configure(10, None)
+    task_ids = [submit(app, f'stub://hls/c{i}', os.path.join(root, 'out')) for i in range(50)]
+    time.sleep(0.5)  # let the first wave start downloading
+    random.shuffle(task_ids)
+    start = time.perf_counter()
+    cancelled_at = {}
+    for task_id in task_ids:
+        cancelled_at[task_id] = time.perf_counter()
+        app.cancel_task(task_id)
+    times = wait_all(app, task_ids, timeout=60)
+    elapsed = time.perf_counter() - start
+    # Cancelled tasks leave in-flight state behind if anything leaks
+    time.sleep(0.2)
+    leaks = app.connection_budget.stats()['in_use'] + len(app.scheduler.snapshot()['running'])
+    unfinished = len(task_ids) - len(times)
+    return {'ops': len(task_ids), 'elapsed': elapsed,
+            'latencies': [finish - cancelled_at[t] for t, (_, finish) in times.items() if finish],
+            'bytes': 0, 'failed': unfinished + leaks,
+            'extra': {'leaked_slots': leaks, 'unfinished': unfinished}}
+
+
+def scenario_info(app, root):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(5):
+        app.metadata_cache.invalidate()
+        app.metadata_url_aliases.invalidate()
+        t0 = time.perf_counter()
+        info = app.get_video_info('stub://playlist/500')
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    ok = 'error' not in info and info.get('count', len(info.get('videos', []))) == 500
+    return {'ops': 5, 'elapsed': elapsed, 'latencies': latencies, 'bytes': 0, 'failed': 0 if ok else 1}
+
+
+def scenario_search(app, root):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(20):
+        app.search_cache.invalidate()
+        t0 = time.perf_counter()
+        results = app.search_media(f'benchmark query {i}', 'youtube', 20)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {'ops': 20, 'elapsed': elapsed, 'latencies': latencies, 'bytes': 0,
+            'failed': 0 if results.get('total') == 20 else 1}
+
+
+def run_scenario(name):
+    """Run one scenario in this process and return its measurements"""
+    import stub_media
+    with tempfile.TemporaryDirectory() as root:
+        app = stub_media.setup_app(root, segment_delay=0.05 if name == 'cancel' else 0)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            result = globals()[f'scenario_{name}'](app, root)
+        app.history_store.flush()
+    latencies = result.pop('latencies')
+    result.update({
+        'scenario': name,
+        'throughput': result['ops'] / result['elapsed'] if result['elapsed'] else None,
+        'mb_per_s': result['bytes'] / result['elapsed'] / 1e6 if result['elapsed'] else None,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'peak_rss_mb': peak_rss_mb(),
+    })
+    return result
+
+
+# ============== DRIVER ==============
+
+def fmt(value, spec, unit=''):
+    return '-' if value is None else f'{value:{spec}}{unit}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='scenario to run (repeatable; default all)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare with')
+    parser.add_argument('--run', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_scenario(args.run)))
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = {r['scenario']: r for r in json.load(f)['results']}
+
+    results = []
+    print(f"{'scenario':<10} {'ops':>5} {'time':>8} {'ops/s':>8} {'MB/s':>7} {'p50':>8} {'p99':>8} "
+          f"{'RSS MB':>7} {'failed':>6}" + ('  vs baseline (time, p99, RSS)' if baseline else ''))
+    for name in args.scenario or SCENARIOS:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{name:<10} crashed:\n{proc.stderr.strip()}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        line = (f"{name:<10} {result['ops']:>5} {result['elapsed']:>7.2f}s {fmt(result['throughput'], '8.1f')} "
+                f"{fmt(result['mb_per_s'], '7.1f')} {fmt(result['p50'], '7.3f', 's')} {fmt(result['p99'], '7.3f', 's')} "
+                f"{fmt(result['peak_rss_mb'], '7.1f')} {result['failed']:>6}")
+        before = baseline.get(name)
+        if before:
+            changes = []
+            for key in ('elapsed', 'p99', 'peak_rss_mb'):
+                if before.get(key) and result.get(key) is not None:
+                    changes.append(f"{(result[key] / before[key] - 1) * 100:+.0f}%")
+                else:
+                    changes.append('-')
+            line += '  ' + ', '.join(changes)
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark - Cold start
+Measures, each in a fresh interpreter:
+  import      time to `import app` (yt-dlp, requests and mutagen are loaded lazily)
+  eager       the same with yt-dlp, requests and mutagen imported up front, as app.py used to
+  ready       desktop_app start-up: import, start_flask until the readiness signal,
+              then until the page the window loads is served; plus the background warm-up
+
+State (job store, history, downloads) goes to a temp dir; webview is not needed.
+
+Usage: python benchmarks/bench_startup.py [--runs N]
+"""
+
+import os
+import sys
+import json
+import atexit
+import shutil
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_import():
+    start = time.perf_counter()
+    import app  # noqa: F401
+    return {'import': time.perf_counter() - start}
+
+
+def run_eager():
+    start = time.perf_counter()
+    import yt_dlp  # noqa: F401
+    import requests  # noqa: F401
+    try:
+        import mutagen.mp3  # noqa: F401
+    except ImportError:
+        pass
+    import app  # noqa: F401
+    return {'import': time.perf_counter() - start}
+
+
+def run_ready():
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter() - start
+
+    root = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    app.job_store.path = os.path.join(root, 'jobs.db')
+    app.history_store.path = app.Path(root) / 'history.jsonl'
+    app.DEFAULT_DOWNLOAD_FOLDER = os.path.join(root, 'out')
+
+    import threading
+    import desktop_app
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        desktop_app.PORT = sock.getsockname()[1]
+    threading.Thread(target=desktop_app.start_flask, daemon=True).start()
+    desktop_app.server_ready.wait(desktop_app.STARTUP_TIMEOUT)
+    ready = time.perf_counter() - start
+    if desktop_app.server_error is not None:
+        raise desktop_app.server_error
+
+    base = f'http://{desktop_app.HOST}:{desktop_app.PORT}'
+    with urllib.request.urlopen(base + '/') as response:
+        response.read()
+    page = time.perf_counter() - start
+
+    urllib.request.urlopen(urllib.request.Request(base + '/api/warmup', method='POST')).read()
+    while True:
+        with urllib.request.urlopen(base + '/api/warmup') as response:
+            state = json.load(response)
+        if state['status'] not in ('idle', 'running'):
+            break
+        time.sleep(0.01)
+    return {'import': imported, 'ready': ready, 'page': page, 'warm_up': state['seconds']}
+
+
+MODES = {'import': run_import, 'eager': run_eager, 'ready': run_ready}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--run', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(MODES[args.run]()))
+        return
+
+    print(f"{'mode':<8} {'metric':<10} {'median':>9} {'min':>9}   ({args.runs} runs)")
+    for mode in MODES:
+        samples = {}
+        for _ in range(args.runs):
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode],
+                                  capture_output=True, text=True, cwd=tempfile.gettempdir())
+            if proc.returncode != 0:
+                print(f"{mode:<8} failed:\n{proc.stderr.strip()}")
+                break
+            for metric, value in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+                samples.setdefault(metric, []).append(value)
+        for metric, values in samples.items():
+            print(f"{mode:<8} {metric:<10} {statistics.median(values) * 1000:>7.0f}ms {min(values) * 1000:>7.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
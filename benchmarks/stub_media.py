@@ -0,0 +1,279 @@
+"""
+Offline stand-ins for the benchmarks: a local media server and stub extractors
+
+The server generates deterministic media on the fly:
+  /media/<id>.mp4                 progressive file (honours Range requests)
+  /hls/<id>/index.m3u8            HLS media playlist of SEGMENTS .ts segments
+  /dash/<id>/manifest.mpd         DASH manifest (SegmentList, muxed audio+video)
+  /<kind>/<id>/seg<N>.<ext>       segments for both
+
+The stub extractors are registered ahead of yt-dlp's own on every YoutubeDL:
+  stub://video/<id>               progressive video
+  stub://hls/<id>, stub://dash/<id>
+  stub://playlist/<N>[/<kind>[/<prefix>]]
+                                  N entries of the given kind (default video), ids prefixed
+  stub://channel/<N>,<M>,...      channel whose tabs are playlists of N, M... videos
+  ytsearchN:<query>               search returning stub videos (replaces YouTube search)
+
+setup_app() wires both into the app with its persistent state in a temp dir.
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor, SearchInfoExtractor
+
+MEDIA_SIZE = 256 * 1024  # bytes per progressive file
+SEGMENTS = 8  # segments per HLS/DASH stream
+SEGMENT_SIZE = 32 * 1024
+SEGMENT_DURATION = 2  # seconds
+
+server_url = None
+extract_calls = Counter()
+
+
+def media_bytes(name, size):
+    """Deterministic pseudo-random content, cheap to generate"""
+    block = (name.encode() * 64)[:256] or b'\0' * 256
+    return (block * (size // len(block) + 1))[:size]
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        match = re.fullmatch(r'/media/([\w-]+)\.mp4', path)
+        if match:
+            return self.send_body(media_bytes(match.group(1), self.server.media_size), 'video/mp4', ranges=True)
+        match = re.fullmatch(r'/hls/([\w-]+)/index\.m3u8', path)
+        if match:
+            return self.send_body(hls_playlist().encode(), 'application/vnd.apple.mpegurl')
+        match = re.fullmatch(r'/dash/([\w-]+)/manifest\.mpd', path)
+        if match:
+            return self.send_body(dash_manifest().encode(), 'application/dash+xml')
+        match = re.fullmatch(r'/(hls|dash)/([\w-]+)/(seg\d+|init)\.\w+', path)
+        if match:
+            time.sleep(self.server.segment_delay)
+            return self.send_body(media_bytes(match.group(2) + match.group(3), SEGMENT_SIZE), 'video/mp2t')
+        self.send_error(404)
+
+    def send_body(self, body, content_type, ranges=False):
+        status, start, end = 200, 0, len(body) - 1
+        range_header = self.headers.get('Range') if ranges else None
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', range_header or '')
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        if ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(body)}')
+        self.end_headers()
+        try:
+            self.wfile.write(body[start:end + 1])
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # cancelled downloads hang up mid-body
+
+
+def hls_playlist():
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{SEGMENT_DURATION}',
+             '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+    for i in range(SEGMENTS):
+        lines += [f'#EXTINF:{SEGMENT_DURATION}.0,', f'seg{i}.ts']
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def dash_manifest():
+    segments = ''.join(f'<SegmentURL media="seg{i}.m4s"/>' for i in range(SEGMENTS))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S" '
+        f'mediaPresentationDuration="PT{SEGMENTS * SEGMENT_DURATION}S" '
+        'profiles="urn:mpeg:dash:profile:isoff-main:2011">'
+        '<Period><AdaptationSet mimeType="video/mp4">'
+        '<Representation id="muxed" bandwidth="800000" width="640" height="360" codecs="avc1.4d401e,mp4a.40.2">'
+        f'<SegmentList timescale="1" duration="{SEGMENT_DURATION}"><Initialization sourceURL="init.mp4"/>'
+        f'{segments}</SegmentList>'
+        '</Representation></AdaptationSet></Period></MPD>'
+    )
+
+
+class StubVideoIE(InfoExtractor):
+    """Single progressive video served by the local media server"""
+    _VALID_URL = r'stub://video/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        return {
+            'id': video_id,
+            'title': f'Stub video {video_id}',
+            'url': f'{server_url}/media/{video_id}.mp4',
+            'ext': 'mp4',
+            'vcodec': 'h264',
+            'acodec': 'aac',
+            'duration': 10,
+            'webpage_url': url,
+        }
+
+
+class StubHlsIE(InfoExtractor):
+    """Video delivered as an HLS playlist"""
+    _VALID_URL = r'stub://hls/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        formats = self._extract_m3u8_formats(f'{server_url}/hls/{video_id}/index.m3u8', video_id, 'mp4')
+        for fmt in formats:
+            fmt.update({'vcodec': 'h264', 'acodec': 'aac'})
+        return {
+            'id': video_id,
+            'title': f'Stub HLS {video_id}',
+            'formats': formats,
+            'duration': SEGMENTS * SEGMENT_DURATION,
+            'webpage_url': url,
+        }
+
+
+class StubDashIE(InfoExtractor):
+    """Video delivered as a DASH manifest"""
+    _VALID_URL = r'stub://dash/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        formats = self._extract_mpd_formats(f'{server_url}/dash/{video_id}/manifest.mpd', video_id)
+        return {
+            'id': video_id,
+            'title': f'Stub DASH {video_id}',
+            'formats': formats,
+            'duration': SEGMENTS * SEGMENT_DURATION,
+            'webpage_url': url,
+        }
+
+
+class StubPlaylistIE(InfoExtractor):
+    """Playlist of N stub entries"""
+    _VALID_URL = r'stub://playlist/(?P<id>\d+)(?:/(?P<kind>video|hls|dash)(?:/(?P<prefix>\w+))?)?'
+
+    def _real_extract(self, url):
+        count, kind, prefix = self._match_valid_url(url).group('id', 'kind', 'prefix')
+        kind = kind or 'video'
+        prefix = prefix or ''
+        ie_key = {'video': StubVideoIE, 'hls': StubHlsIE, 'dash': StubDashIE}[kind].ie_key()
+        entries = [
+            self.url_result(f'stub://{kind}/{prefix}{kind[0]}{i}', ie_key, f'{prefix}{kind[0]}{i}', f'Stub entry {i}')
+            for i in range(int(count))
+        ]
+        return self.playlist_result(entries, f'pl{prefix}{count}{kind}', f'Stub playlist ({count})')
+
+
+class StubChannelIE(InfoExtractor):
+    """Channel whose entries are tab playlists, like YouTube's Videos/Shorts/Live"""
+    _VALID_URL = r'stub://channel/(?P<id>\d+(?:,\d+)*)'
+
+    def _real_extract(self, url):
+        counts = self._match_id(url).split(',')
+        entries = [
+            self.url_result(f'stub://playlist/{count}/video/tab{i}', StubPlaylistIE.ie_key(), title=f'Tab {i}')
+            for i, count in enumerate(counts)
+        ]
+        return self.playlist_result(entries, f'ch{"-".join(counts)}', 'Stub channel')
+
+
+class StubSearchIE(SearchInfoExtractor):
+    """Offline replacement for YouTube search"""
+    IE_NAME = 'stub:search'
+    _SEARCH_KEY = 'ytsearch'
+
+    def _search_results(self, query):
+        for i in range(1000):
+            video_id = f'q{zlib.crc32(query.encode()) % 10000}x{i}'
+            yield {
+                '_type': 'url',
+                'url': f'stub://video/{video_id}',
+                'ie_key': StubVideoIE.ie_key(),
+                'id': video_id,
+                'title': f'{query} result {i}',
+                'duration': 60 + i,
+                'uploader': 'Stub channel',
+                'view_count': 1000 - i,
+            }
+
+
+STUB_EXTRACTORS = (StubSearchIE, StubChannelIE, StubPlaylistIE, StubHlsIE, StubDashIE, StubVideoIE)
+
+
+def install_stubs():
+    """Register the stub extractors on every YoutubeDL and count invocations"""
+    original_defaults = yt_dlp.YoutubeDL.add_default_info_extractors
+    original_extract = InfoExtractor.extract
+
+    def add_default_info_extractors(ydl):
+        for ie in STUB_EXTRACTORS:
+            ydl.add_info_extractor(ie())
+        original_defaults(ydl)
+
+    def extract(ie, url):
+        extract_calls[ie.ie_key()] += 1
+        return original_extract(ie, url)
+
+    yt_dlp.YoutubeDL.add_default_info_extractors = add_default_info_extractors
+    InfoExtractor.extract = extract
+
+
+def start_server(media_size=MEDIA_SIZE, segment_delay=0):
+    """Start the media server on a free port (daemon thread); returns the server
+    
+    segment_delay (seconds) slows down every HLS/DASH segment, to keep
+    downloads in flight long enough to cancel them.
+    """
+    global server_url
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    server.daemon_threads = True
+    server.media_size = media_size
+    server.segment_delay = segment_delay
+    server_url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def setup_app(root, segment_delay=0):
+    """Point the app's persistent state at root, install the stubs and start the server
+    
+    Keeps benchmark runs out of the checkout's job store, history and caches.
+    """
+    import app
+
+    app.job_store.path = os.path.join(root, 'jobs.db')
+    app.history_store.path = app.Path(root) / 'history.jsonl'
+    app.thumbnail_cache = app.ThumbnailCache(os.path.join(root, 'thumbnails'), app.THUMBNAIL_CACHE_MAX_BYTES)
+    app.preview_cache = app.PreviewCache(os.path.join(root, 'previews'), app.PREVIEW_CACHE_MAX_BYTES)
+    app.profile_store = app.ProfileStore(os.path.join(root, 'profiles'), app.PROFILE_KEEP)
+    app.DEFAULT_DOWNLOAD_FOLDER = os.path.join(root, 'out')
+    app.send_notification = lambda *args, **kwargs: None
+    install_stubs()
+    start_server(segment_delay=segment_delay)
+    return app
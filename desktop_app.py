@@ -3,7 +3,6 @@
 YouTube Extractor - Desktop Application
 Launches the Flask app in a native Windows window using PyWebView
 """
-import webview
 import threading
 import sys
 import os
@@ -21,11 +20,22 @@ else:
 sys.path.insert(0, BASE_DIR)
 
 # Import Flask app
-from app import app, load_history, DEFAULT_DOWNLOAD_FOLDER
+from app import app, load_history, resume_jobs, DEFAULT_DOWNLOAD_FOLDER
+
+HOST = '127.0.0.1'
+PORT = 5000
+STARTUP_TIMEOUT = 30  # seconds to wait for the server before opening the window anyway
+
+# Set by start_flask once the server accepts connections (or failed to bind)
+server_ready = threading.Event()
+server_error = None
+
 
 def start_flask():
     """Start Flask server in background thread"""
+    global server_error
     import logging
+    from werkzeug.serving import make_server
     # Suppress Flask logs in production
     log = logging.getLogger('werkzeug')
     log.setLevel(logging.ERROR)
@@ -33,11 +43,19 @@ def start_flask():
     # Create download folder
     os.makedirs(DEFAULT_DOWNLOAD_FOLDER, exist_ok=True)
     
-    # Load history
+    # Load history and re-queue jobs interrupted by the last shutdown
     load_history()
+    resume_jobs()
     
-    # Run Flask (without debug for production)
-    app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False, threaded=True)
+    # Bind first, so readiness is signalled only once connections are accepted
+    try:
+        server = make_server(HOST, PORT, app, threaded=True)
+    except OSError as e:
+        server_error = e
+        server_ready.set()
+        return
+    server_ready.set()
+    server.serve_forever()
 
 
 def main():
@@ -46,14 +64,20 @@ def main():
     flask_thread = threading.Thread(target=start_flask, daemon=True)
     flask_thread.start()
     
+    # Loads while the server starts
+    import webview
+    
     # Wait for Flask to start
-    import time
-    time.sleep(1)
+    if not server_ready.wait(STARTUP_TIMEOUT):
+        print(f"Server not ready after {STARTUP_TIMEOUT}s, opening the window anyway")
+    elif server_error is not None:
+        # Most likely another instance already serving the port
+        print(f"Could not start the server on port {PORT}: {server_error}")
     
     # Create native window
     window = webview.create_window(
         title='YouTube Extractor v1.0.2',
-        url='http://127.0.0.1:5000',
+        url=f'http://{HOST}:{PORT}',
         width=1200,
         height=800,
         resizable=True,